@@ -0,0 +1,58 @@
+import sys
+import time
+from json_model import F, Matcher, matches
+
+
+class Item(object):
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+CRITERIA = {
+    'one constant': {'kind': 'K3'},
+    'three constants': {'active': False, 'kind': 'K3', 'owner': 'O7'},
+    'constant and F': {'kind': 'K3', 'name': F('check')},
+}
+
+
+def build(size):
+    return [
+        Item(
+            id=i,
+            name='NAME_{n}'.format(n=i % 100),
+            check='NAME_{n}'.format(n=i % 7),
+            kind='K{n}'.format(n=i % 10),
+            owner='O{n}'.format(n=i % 13),
+            active=i % 2 == 0
+        )
+        for i in range(size)
+    ]
+
+
+def per_item(func, items):
+    start = time.perf_counter()
+    count = func(items)
+    return (time.perf_counter() - start) / len(items), count
+
+
+def run(size=1000000):
+    items = build(size)
+    results = []
+    for label, criteria in CRITERIA.items():
+        interpreted, expected = per_item(lambda data: sum(1 for item in data if matches(item, **criteria)), items)
+        matcher = Matcher(criteria)
+        compiled, count = per_item(lambda data: sum(1 for item in data if matcher(item)), items)
+        if count != expected:
+            raise AssertionError('Matcher disagrees with matches() for: {crit}'.format(crit=criteria))
+        results.append((label, count, interpreted, compiled))
+    return results
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print('{size} items'.format(size=size))
+    print('{:<16} {:>8} {:>16} {:>16} {:>9}'.format('criteria', 'matched', 'matches() (ns)', 'Matcher (ns)', 'speedup'))
+    for label, count, interpreted, compiled in run(size):
+        print('{:<16} {:>8} {:>16.1f} {:>16.1f} {:>8.1f}x'.format(
+                label, count, interpreted * 1e9, compiled * 1e9, interpreted / compiled))
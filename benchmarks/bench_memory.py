@@ -0,0 +1,66 @@
+import gc
+import sys
+import tracemalloc
+from json_model import EmbeddedManager, Expression, F, Finder, FinderExpression
+
+
+class Item(Finder):
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+def per_instance(factory, count=20000):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return (after - before) / count - sys.getsizeof([None] * count) / count
+
+
+def allocated(func, repeat=3):
+    func()
+    gc.collect()
+    tracemalloc.start()
+    for _ in range(repeat):
+        func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(size=2000):
+    data = [Item(id=i, kind='K{k}'.format(k=i % 5)) for i in range(10)]
+    manager = EmbeddedManager(data)
+    instances = {
+        'EmbeddedManager': lambda i: EmbeddedManager(data),
+        'EmbeddedIterator all()': lambda i: manager.all(),
+        'EmbeddedIterator filter()': lambda i: manager.filter(kind='K1'),
+        'Expression (3 nodes)': lambda i: Expression('a.b[id={i}].c'.format(i=i)),
+        'FinderExpression (3 nodes)': lambda i: FinderExpression('**.b[id={i}].c'.format(i=i)),
+        'F': lambda i: F('a{i}'.format(i=i)),
+    }
+    root = Item(id=0, children=[
+        Item(id=i, kind='K{k}'.format(k=i % 5), children=[Item(id=j, name='LEAF') for j in range(5)])
+        for i in range(size)
+    ])
+    workloads = {
+        'find children.children.name': lambda: root.__find__('children.children.name'),
+        'find **[kind="K2"].id': lambda: root.__find__('**[kind="K2"].id'),
+    }
+    results = []
+    for label, factory in instances.items():
+        results.append({'name': 'instance[{label}]'.format(label=label), 'bytes': per_instance(factory)})
+    for label, func in workloads.items():
+        results.append({'name': 'peak[{label}]'.format(label=label), 'bytes': allocated(func)})
+    return results
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print('{:<45} {:>14}'.format('measurement', 'bytes'))
+    for result in run(size):
+        print('{:<45} {:>14,.0f}'.format(result['name'], result['bytes']))
@@ -0,0 +1,93 @@
+import logging
+import timeit
+from json_model import parse_criteria, _set_criteria
+logger = logging.getLogger('json_model')
+
+CRITERIA = {
+    'short': 'id=3',
+    'compound': 'id=3,name="NAME_2_3",flag=true',
+    'long': ','.join(
+        'field_{i}="{value}"'.format(i=i, value='VALUE_' * 4 + str(i)) if i % 2 else 'field_{i}={i}.5'.format(i=i)
+        for i in range(40)
+    ),
+}
+
+
+def legacy_parse_criteria(criteria):
+    # The per-character state machine that parse_criteria replaced, kept as the benchmark baseline
+    crit = {}
+    value = ''
+    name = None
+    quote = None
+    expect = None
+    for char in criteria:
+        logger.debug('name: {name}, value: {value}, expect: {expect}, quote: {quote}, char: {char}'.format(
+                name=name,
+                value=value,
+                expect=expect,
+                char=char,
+                quote=quote
+            ))
+        if expect:
+            if char == expect:
+                expect = None
+                continue
+            raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+        if quote and char == quote:
+            quote = None
+            crit[name] = value
+            name = None
+            value = ''
+            expect = ','
+            continue
+        if char in ['"',"'"] and not quote:
+            if not name:
+                raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+            quote = char
+            continue
+        if quote:
+            value = value + char
+            continue
+        if char == ',':
+            if not name or value == '':
+                raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+            _set_criteria(crit, name, value, criteria)
+            name = None
+            value = ''
+            continue
+        if char == '=':
+            if value == '':
+                raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+            name = value
+            value = ''
+            continue
+        value = value + char
+    if quote:
+        raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+    if len(value) > 0 and not name:
+        raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+    if name:
+        _set_criteria(crit, name, value, criteria)
+    return crit
+
+
+def best_of(func, criteria, number, repeat=5):
+    return min(timeit.repeat(lambda: func(criteria), number=number, repeat=repeat)) / number
+
+
+def run(number=500):
+    results = []
+    for label, criteria in CRITERIA.items():
+        if legacy_parse_criteria(criteria) != parse_criteria(criteria):
+            raise AssertionError('parse_criteria disagrees with the legacy parser for: {crit}'.format(crit=criteria))
+        legacy = best_of(legacy_parse_criteria, criteria, number)
+        current = best_of(parse_criteria, criteria, number)
+        results.append((label, len(criteria), legacy, current))
+    return results
+
+
+if __name__ == '__main__':
+    print('{:<10} {:>6} {:>14} {:>14} {:>9}'.format('criteria', 'chars', 'legacy (us)', 'current (us)', 'speedup'))
+    for label, length, legacy, current in run():
+        print('{:<10} {:>6} {:>14.2f} {:>14.2f} {:>8.1f}x'.format(
+                label, length, legacy * 1e6, current * 1e6, legacy / current))
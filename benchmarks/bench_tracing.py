@@ -0,0 +1,91 @@
+import ast
+import inspect
+import sys
+import timeit
+import types
+import json_model
+
+
+class StripTracing(ast.NodeTransformer):
+    
+    def _is_trace(self, node):
+        if not isinstance(node, ast.Expr) or not isinstance(node.value, ast.Call):
+            return False
+        func = node.value.func
+        if isinstance(func, ast.Name):
+            return func.id == 'trace'
+        return isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'logger'
+    
+    def _strip(self, body):
+        body = [self.visit(node) for node in body if not self._is_trace(node)]
+        return body if body else [ast.Pass()]
+    
+    def generic_visit(self, node):
+        for field in ('body', 'orelse', 'finalbody'):
+            if isinstance(getattr(node, field, None), list) and getattr(node, field):
+                setattr(node, field, self._strip(getattr(node, field)))
+        return super(StripTracing, self).generic_visit(node)
+
+
+def stripped_module():
+    tree = StripTracing().visit(ast.parse(inspect.getsource(json_model)))
+    ast.fix_missing_locations(tree)
+    module = types.ModuleType('json_model_stripped')
+    module.__file__ = json_model.__file__
+    module.__package__ = json_model.__name__
+    sys.modules[module.__name__] = module
+    exec(compile(tree, json_model.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def workload(module, size):
+    
+    class Item(module.Finder):
+        def __init__(self, **kw):
+            for key, value in kw.items():
+                setattr(self, key, value)
+    
+    root = Item(
+        id=0,
+        name='ROOT',
+        children=module.EmbeddedManager([
+            Item(
+                id=i,
+                name='NAME_{i}'.format(i=i),
+                kind='K{k}'.format(k=i % 5),
+                children=module.EmbeddedManager([Item(id=j, name='LEAF_{j}'.format(j=j), kind='K{k}'.format(k=j % 5)) for j in range(5)])
+            )
+            for i in range(size)
+        ])
+    )
+    manager = root.children
+    return {
+        'find path': lambda: root.__find__('children[kind="K1"].children.name'),
+        'find **': lambda: root.__find__('**[kind="K2"].name'),
+        'filter': lambda: len(manager.filter(kind='K3')),
+        'get': lambda: manager.get(id=size - 1),
+    }
+
+
+def run(size=200, number=20, repeat=15):
+    workloads = [
+        ('stripped', workload(stripped_module(), size)),
+        ('traced', workload(json_model, size))
+    ]
+    timings = {}
+    for attempt in range(repeat):
+        for label, cases in workloads:
+            for case, func in cases.items():
+                elapsed = timeit.timeit(func, number=number) / number
+                best = timings.setdefault(case, {}).get(label)
+                timings[case][label] = elapsed if best == None else min(best, elapsed)
+    return timings
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print('{size} top level items, DEBUG disabled'.format(size=size))
+    print('{:<10} {:>14} {:>14} {:>8}'.format('case', 'stripped (us)', 'traced (us)', 'ratio'))
+    for case, timing in run(size).items():
+        print('{:<10} {:>14.1f} {:>14.1f} {:>8.3f}'.format(
+                case, timing['stripped'] * 1e6, timing['traced'] * 1e6, timing['traced'] / timing['stripped']))
@@ -0,0 +1,225 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from json_model import EmbeddedManager, Expression, F, Finder, expression_cache, parse_criteria
+from . import bench_memory
+
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+QUICK_SIZES = (10, 100, 1000, 10000)
+
+CRITERIA = {
+    1: {'kind': 'K3'},
+    3: {'kind': 'K3', 'active': True, 'rank__gte': 4},
+    5: {'kind': 'K3', 'active': True, 'rank__gte': 4, 'owner__in': ['O1', 'O2', 'O3'], 'id__gt': -1},
+}
+
+PATHS = {
+    1: 'children',
+    2: 'children.name',
+    3: 'children.children.name',
+    4: 'children.children.link.name',
+}
+
+
+class Item(Finder):
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+def item(i):
+    return Item(
+        id=i,
+        name='NAME_{n}'.format(n=i % 100),
+        check='NAME_{n}'.format(n=i % 7),
+        kind='K{n}'.format(n=i % 10),
+        owner='O{n}'.format(n=i % 13),
+        rank=i % 8,
+        active=i % 2 == 0
+    )
+
+
+def build_tree(size):
+    width = max(1, int(round(size ** 0.5)))
+    leaf = Item(id=-1, name='LINKED')
+    return Item(id=0, name='ROOT', children=EmbeddedManager([
+        Item(id=i, name='NAME_{i}'.format(i=i), kind='K{k}'.format(k=i % 5), children=EmbeddedManager([
+            Item(id=j, name='LEAF_{j}'.format(j=j), kind='K{k}'.format(k=j % 5), link=leaf)
+            for j in range(width)
+        ]))
+        for i in range(max(1, size // width))
+    ]))
+
+
+def cases(sizes):
+    for depth, path in PATHS.items():
+        yield 'parse.path', {'depth': depth}, 1, lambda path=path: Expression(path)
+    for count, criteria in CRITERIA.items():
+        text = ','.join('{key}="{value}"'.format(key=key, value=value) for key, value in criteria.items() if not isinstance(value, list))
+        yield 'parse.criteria', {'criteria': count}, 1, lambda text=text: parse_criteria(text)
+    for size in sizes:
+        items = [item(i) for i in range(size)]
+        for backing in ('list', 'dict'):
+            manager = EmbeddedManager(items if backing == 'list' else {i: value for i, value in enumerate(items)})
+            for count, criteria in CRITERIA.items():
+                params = {'size': size, 'backing': backing, 'criteria': count, 'F': False}
+                yield 'filter', params, size, lambda manager=manager, criteria=criteria: len(manager.filter(**criteria))
+            with_f = dict(CRITERIA[1], name=F('check'))
+            params = {'size': size, 'backing': backing, 'criteria': 2, 'F': True}
+            yield 'filter', params, size, lambda manager=manager, criteria=with_f: len(manager.filter(**criteria))
+            last = {'id': size - 1, 'kind': items[-1].kind}
+            yield 'get', {'size': size, 'backing': backing}, size, lambda manager=manager, last=last: manager.get(**last)
+        del items
+        tree = build_tree(size)
+        for depth, path in PATHS.items():
+            yield 'find', {'size': size, 'depth': depth}, size, lambda tree=tree, path=path: tree.__find__(path)
+        yield 'find', {'size': size, 'depth': 2, 'wildcard': '*'}, size, lambda tree=tree: tree.__find__('*.name')
+        yield 'find', {'size': size, 'depth': 2, 'wildcard': '**'}, size, lambda tree=tree: tree.__find__('**.name')
+        yield 'find', {'size': size, 'depth': 2, 'wildcard': '**', 'criteria': 1}, size, lambda tree=tree: tree.__find__('**[kind="K2"].name')
+
+
+def case_name(name, params):
+    return '{name}[{params}]'.format(name=name, params=','.join('{key}={value}'.format(key=key, value=params[key]) for key in sorted(params)))
+
+
+def measure(func, repeat, min_time):
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_time or number >= 1000000:
+            break
+        number = number * 10 if elapsed < min_time / 10 else number * 2
+    samples = [elapsed / number] + [timeit.timeit(func, number=number) / number for _ in range(repeat - 1)]
+    return number, samples
+
+
+def run(sizes=SIZES, repeat=5, min_time=0.05, pattern=None, out=None, memory=True):
+    results = []
+    for name, params, items, func in cases(sizes):
+        label = case_name(name, params)
+        if pattern != None and pattern not in label:
+            continue
+        expression_cache.clear()
+        number, samples = measure(func, repeat, min_time)
+        best = min(samples)
+        result = {
+            'name': label,
+            'case': name,
+            'params': params,
+            'number': number,
+            'min': best,
+            'median': statistics.median(samples),
+            'ops_per_sec': 1 / best,
+            'items_per_sec': items / best,
+        }
+        results.append(result)
+        if out != None:
+            out.write('{name:<60} {latency:>14.2f} us {rate:>16,.0f} items/s\n'.format(
+                    name=label, latency=best * 1e6, rate=result['items_per_sec']))
+    memory = bench_memory.run() if memory else []
+    if out != None:
+        for result in memory:
+            out.write('{name:<60} {size:>14,.0f} bytes\n'.format(name=result['name'], size=result['bytes']))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+        },
+        'results': results,
+        'memory': memory,
+    }
+
+
+def compare(base, current, threshold=0.1):
+    before = {result['name']: result for result in base['results']}
+    rows = []
+    for result in current['results']:
+        previous = before.get(result['name'])
+        if previous == None:
+            continue
+        ratio = result['min'] / previous['min']
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 - threshold:
+            status = 'improved'
+        else:
+            status = ''
+        rows.append((result['name'], previous['min'], result['min'], ratio, status))
+    return rows
+
+
+def compare_memory(base, current, threshold=0.1):
+    before = {result['name']: result for result in base.get('memory', [])}
+    rows = []
+    for result in current.get('memory', []):
+        previous = before.get(result['name'])
+        if previous == None or previous['bytes'] <= 0:
+            continue
+        ratio = result['bytes'] / previous['bytes']
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 - threshold:
+            status = 'improved'
+        else:
+            status = ''
+        rows.append((result['name'], previous['bytes'], result['bytes'], ratio, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description='json_model benchmark suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+    runner = commands.add_parser('run', help='run the benchmarks and write the results as JSON')
+    runner.add_argument('--sizes', default=None, help='comma separated collection sizes (default: 10 to 10^6)')
+    runner.add_argument('--quick', action='store_true', help='only sizes up to 10^4')
+    runner.add_argument('--repeat', type=int, default=5)
+    runner.add_argument('--min-time', type=float, default=0.05, help='minimum seconds per sample')
+    runner.add_argument('--filter', default=None, help='only run cases whose name contains this text')
+    runner.add_argument('--output', '-o', default=None, help='file to write the JSON results to')
+    runner.add_argument('--no-memory', action='store_true', help='skip the memory per instance measurements')
+    comparer = commands.add_parser('compare', help='compare two result files and flag regressions')
+    comparer.add_argument('base')
+    comparer.add_argument('current')
+    comparer.add_argument('--threshold', type=float, default=0.1, help='relative slowdown flagged as a regression')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        sizes = QUICK_SIZES if args.quick else SIZES
+        if args.sizes:
+            sizes = [int(size) for size in args.sizes.split(',')]
+        results = run(sizes, args.repeat, args.min_time, args.filter, sys.stderr, not args.no_memory)
+        if args.output:
+            with open(args.output, 'w') as fp:
+                json.dump(results, fp, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+        return 0
+
+    with open(args.base) as fp:
+        base = json.load(fp)
+    with open(args.current) as fp:
+        current = json.load(fp)
+    rows = compare(base, current, args.threshold)
+    print('{:<60} {:>12} {:>12} {:>7}'.format('case', 'base (us)', 'current (us)', 'ratio'))
+    for name, before, after, ratio, status in rows:
+        print('{:<60} {:>12.2f} {:>12.2f} {:>7.2f} {}'.format(name, before * 1e6, after * 1e6, ratio, status))
+    memory = compare_memory(base, current, args.threshold)
+    if memory:
+        print('{:<60} {:>12} {:>12} {:>7}'.format('memory', 'base (B)', 'current (B)', 'ratio'))
+    for name, before, after, ratio, status in memory:
+        print('{:<60} {:>12,.0f} {:>12,.0f} {:>7.2f} {}'.format(name, before, after, ratio, status))
+    regressions = [row for row in rows + memory if row[4] == 'REGRESSION']
+    print('{count} regressions over {threshold:.0%}'.format(count=len(regressions), threshold=args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
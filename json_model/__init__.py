@@ -1,6 +1,102 @@
+import asyncio
+import bisect
 import logging
+import operator
+import re
+import threading
+import time
+import weakref
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from operator import attrgetter
+from types import MappingProxyType
+try:
+    import numpy
+except ImportError:
+    numpy = None
 logger = logging.getLogger(__name__)
 
+class Deferred(object):
+    
+    __slots__ = ('function',)
+    
+    def __init__(self, function):
+        self.function = function
+
+class Tracer(object):
+    
+    def __init__(self, logger, level=logging.DEBUG):
+        self.logger = logger
+        self.level = level
+        
+    @property
+    def enabled(self):
+        return self.logger.isEnabledFor(self.level)
+    
+    def __call__(self, message, **kw):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        for key, value in kw.items():
+            if isinstance(value, Deferred):
+                kw[key] = value.function()
+        self.logger.log(self.level, message.format(**kw))
+
+trace = Tracer(logger)
+
+class Stats(object):
+    
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+        
+    def counted(self, name, function):
+        counters = self.counters
+        def counted(*args):
+            counters[name] = counters.get(name, 0) + 1
+            return function(*args)
+        return counted
+    
+    def reset(self):
+        self.counters.clear()
+        
+    def snapshot(self):
+        snapshot = dict(self.counters)
+        info = expression_cache.info()
+        snapshot['parse_cache.hits'] = info['hits']
+        snapshot['parse_cache.misses'] = info['misses']
+        return snapshot
+
+instrument = Stats()
+
+def stats():
+    return instrument.snapshot()
+
+def enable_stats(enabled=True):
+    instrument.enabled = enabled
+    
+def reset_stats():
+    instrument.reset()
+
+@contextmanager
+def collect_stats():
+    collected = {}
+    enabled = instrument.enabled
+    start = instrument.snapshot()
+    instrument.enabled = True
+    try:
+        yield collected
+    finally:
+        instrument.enabled = enabled
+        for name, value in instrument.snapshot().items():
+            delta = value - start.get(name, 0)
+            if delta:
+                collected[name] = delta
+
 def _set_criteria(crit, name, value, criteria):
     if not name:
         raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
@@ -19,63 +115,51 @@ def _set_criteria(crit, name, value, criteria):
             else:
                 raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))                    
 
+_criteria_tokens = re.compile(r'''"[^"]*"?|'[^']*'?|[<>!]=|[=<>,]|(?:[^=<>!,"']|!(?!=))+''')
+
+_criteria_operator = re.compile('[=<>]')
+
+_criteria_operators = {
+    '=': '',
+    '!=': '__ne',
+    '>': '__gt',
+    '>=': '__gte',
+    '<': '__lt',
+    '<=': '__lte'
+}
+
 def parse_criteria(criteria):
     crit = {}
     value = ''
     name = None
-    quote = None
-    expect = None
-    for char in criteria:
-        logger.debug('name: {name}, value: {value}, expect: {expect}, quote: {quote}, char: {char}'.format(
-                name=name,
-                value=value,
-                expect=expect,
-                char=char,
-                quote=quote
-            ))
+    expect = False
+    for token in _criteria_tokens.findall(criteria):
+        char = token[0]
         if expect:
-            logger.debug('EXPECT')
-            if char == expect:
-                expect = None
+            if token == ',':
+                expect = False
                 continue
             raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
-        if quote and char == quote:
-            logger.debug('QUOTED and CHAR == QUOTE')
-            quote = None
-            crit[name] = value
+        if char == '"' or char == "'":
+            if not name or len(token) == 1 or token[-1] != char:
+                raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+            crit[name] = value + token[1:-1]
             name = None
             value = ''
-            expect = ','
-            continue
-        if char in ['"',"'"] and not quote:
-            logger.debug('CHAR IS QUOTE AND NOT QUOTED')
-            if not name:
-                raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
-            quote = char
-            continue
-        if quote:
-            logger.debug('QUOTED')
-            value = value + char
-            continue
-        if char == ',':
-            logger.debug('COMMA')
+            expect = True
+        elif token == ',':
             if not name or value == '':
                 raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
             _set_criteria(crit, name, value, criteria)
             name = None
             value = ''
-            continue
-        if char == '=':
-            logger.debug('EQUALS')
+        elif token in _criteria_operators:
             if value == '':
                 raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
-            name = value
+            name = value + _criteria_operators[token]
             value = ''
-            continue
-        logger.debug('ADD TO VALUE')
-        value = value + char
-    if quote:
-        raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
+        else:
+            value = value + token
     if len(value) > 0 and not name:
         raise ValueError(('Invalid syntax in criteria: {crit}'.format(crit=criteria)))
     if name:
@@ -83,11 +167,77 @@ def parse_criteria(criteria):
     return crit
         
 
+class ExpressionCache(object):
+    
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.__entries)
+    
+    def get(self, cls, path, **kw):
+        key = (cls, path, tuple(sorted(kw.items())))
+        with self.__lock:
+            expression = self.__entries.get(key)
+            if expression is not None:
+                self.__entries.move_to_end(key)
+                self.hits = self.hits + 1
+                return expression
+            self.misses = self.misses + 1
+        expression = cls(path, **kw)
+        expression._freeze()
+        with self.__lock:
+            self.__entries[key] = expression
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+        return expression
+    
+    def resize(self, maxsize):
+        with self.__lock:
+            self.maxsize = maxsize
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+    
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+            
+    def info(self):
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.__entries),
+                'maxsize': self.maxsize
+            }
+
+expression_cache = ExpressionCache()
+
+
+_no_options = MappingProxyType({})
+
 class Expression(object):
+    
+    __slots__ = ('path', 'options', 'segment', 'name', 'criteria', 'index', 'next', '_frozen')
+    
+    @classmethod
+    def compile(cls, path, **kw):
+        return expression_cache.get(cls, path, **kw)
+    
     def __init__(self, path, **kw):
         if path == None or path == '':
             raise ValueError('You must supply a value for path')
         names = path.split('.')
+        self.path = path
+        self.options = kw if kw else _no_options
+        self.segment = names[0]
         self.name = names[0]
         self.criteria = None
         self.index = None
@@ -99,7 +249,7 @@ class Expression(object):
             try:
                 self.index = int(criteria)
             except ValueError:
-                if '=' not in criteria:
+                if not _criteria_operator.search(criteria):
                     self.index = criteria
                 else:
                     self.criteria = parse_criteria(criteria)
@@ -107,7 +257,23 @@ class Expression(object):
         if len(names) > 1:
             self.next = self.__class__('.'.join(names[1:]), **kw)
             
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('Compiled expressions are immutable')
+        super(Expression, self).__setattr__(name, value)
+        
+    def __reduce__(self):
+        return (_compile_expression, (self.__class__, self.path, dict(self.options)))
+        
+    def _freeze(self):
+        if self.criteria != None:
+            self.criteria = MappingProxyType(dict(self.criteria))
+        if self.next != None:
+            self.next._freeze()
+        self._frozen = True
+            
     def evaluate(self, obj):
+        tracing = trace.enabled
         if not hasattr(obj, self.name):
             raise AttributeError('The object of type: {type} does not have an attribute: {attr}'.format(
                     type = type(obj),
@@ -115,15 +281,18 @@ class Expression(object):
                 ))
         value = getattr(obj, self.name)
         if isinstance(value, EmbeddedManager):
-            logger.debug('Value is an EmbeddedManager')
+            if tracing:
+                trace('Value is an EmbeddedManager')
             if self.criteria:
-                logger.debug('EmbeddedManager with criteria: {crit}'.format(crit=self.criteria))
+                if tracing:
+                    trace('EmbeddedManager with criteria: {crit}', crit=self.criteria)
                 try:
                     value = value.get(**self.criteria)
                 except DoesNotExist:
                     value = None
             elif self.index != None:
-                logger.debug('EmbeddedManager with index: {idx}'.format(idx=self.index))
+                if tracing:
+                    trace('EmbeddedManager with index: {idx}', idx=self.index)
                 length = len(value)
                 if self.index >= length or self.index < -length:
                     value = None
@@ -141,178 +310,1046 @@ class Expression(object):
             return value
         return self.next.evaluate(value)
 
+def _compile_expression(cls, path, options):
+    return cls.compile(path, **options)
+
 class F(Expression):
-    pass
+    __slots__ = ()
 
 class DoesNotExist(Exception):
     pass
 
 
+_list_types = (list,)
+
+async_chunk_size = 1024
+
 class EmbeddedIterator(object):
-    def __init__(self, data, **kw):
+    
+    __slots__ = ('__data', '__rows', '__source', '__parent', '__pending', '__length', '__criteria', '__selected', '__members', '__keys', '__matcher', '__index', '__cache_key')
+    
+    def __init__(self, data, rows=None, source=None, parent=None, /, **kw):
         self.__data = data
+        self.__rows = rows
+        self.__source = source
+        self.__parent = parent
+        self.__pending = bool(kw) or (parent != None and parent.__pending)
         self.__length = None
-        self.__criteria = kw
-        self.__filtered = None
+        self.__criteria = MappingProxyType(kw)
+        self.__selected = None
+        self.__members = None
+        self.__keys = None
+        self.__matcher = None
+        self.__cache_key = None
         
     def is_dict(self):
         return isinstance(self.__data, dict)
         
     def is_list(self):
-        return isinstance(self.__data, list)
+        return isinstance(self.__data, _list_types)
+    
+    def is_materialised(self):
+        return not self.__pending or self.__selected != None
+    
+    def rows(self):
+        return self._selection()
+    
+    def _cache_as(self, key):
+        if self.is_materialised():
+            self.__source._cache_put(key, self._selection())
+        else:
+            self.__cache_key = key
+    
+    def _selection(self):
+        if not self.__pending:
+            return self.__rows
+        if self.__selected == None:
+            self._apply_filter()
+        return self.__selected
         
     def __iter__(self):
         self.__index = 0
-        if self.__criteria:
-            if self.__filtered == None:
-                self._apply_filter()
+        if not self.is_materialised():
+            self.__keys = self._stream()
+            return self
+        rows = self._selection()
+        if rows != None:
+            self.__keys = iter(rows) if self.is_dict() else map(self.__data.__getitem__, rows)
+        elif self.is_dict():
+            self.__keys = iter(self.__data)
+        else:
+            self.__keys = None
         return self
     
     def __next__(self):
-        data = self.__filtered if self.__filtered != None else self.__data
-        if self.__index >= self.__len__():
+        if self.__keys != None:
+            return next(self.__keys)
+        if self.__index >= len(self.__data):
             raise StopIteration
-        if self.is_dict():
-            item = list(data)[self.__index]
-        else:            
-            item = data[self.__index]
+        item = self.__data[self.__index]
         self.__index = self.__index + 1
         return item
     
-    def _apply_filter(self):
-        count = 0
+    def _matcher(self):
+        if self.__matcher == None:
+            self.__matcher = Matcher(self.__criteria)
+        return self.__matcher
+    
+    def _plan(self, extra=None):
+        chain = []
+        cached = None
+        node = self
+        while node != None:
+            if node.__selected != None:
+                cached = node
+                break
+            if node.__criteria:
+                chain.append(node)
+            node = node.__parent
+        chain.reverse()
+        residual = [node.__criteria for node in chain]
+        matchers = [node._matcher() for node in chain]
+        if extra:
+            residual.append(extra)
+            matchers.append(Matcher(extra))
+        if cached != None:
+            driver = 'cached'
+            rows = cached.__selected
+        else:
+            driver = 'rows' if self.__rows != None else 'scan'
+            rows = self.__rows
+        size = len(self.__data) if rows == None else len(rows)
+        index = None
+        source = self.__source
+        if source != None and residual and source.data() is self.__data:
+            best = None
+            for position, criteria in enumerate(residual):
+                lookup = source._index_lookup(criteria, size)
+                if lookup != None and len(lookup[0]) < size and (best == None or len(lookup[0]) < len(best[1][0])):
+                    best = (position, lookup)
+            if best != None:
+                position, (found, remaining) = best
+                if rows != None:
+                    members = frozenset(rows)
+                    found = tuple([row for row in found if row in members]) if self.is_dict() else array('I', [row for row in found if row in members])
+                driver = 'index'
+                index = tuple([key for key in residual[position] if key not in remaining])
+                rows = found
+                size = len(found)
+                residual[position] = remaining
+                matchers[position] = Matcher(remaining) if remaining else None
+        return {
+            'driver': driver,
+            'index': index,
+            'candidates': size,
+            'rows': rows,
+            'residual': [criteria for criteria in residual if criteria],
+            'matchers': [matcher for matcher in matchers if matcher != None]
+        }
+    
+    def explain(self, **kw):
+        if not kw and self.is_materialised():
+            rows = self._selection()
+            return {
+                'driver': 'materialised',
+                'index': None,
+                'candidates': len(self.__data) if rows == None else len(rows),
+                'residual': []
+            }
+        plan = self._plan(kw)
+        return {
+            'driver': plan['driver'],
+            'index': plan['index'],
+            'candidates': plan['candidates'],
+            'residual': [dict(criteria) for criteria in plan['residual']]
+        }
+    
+    def _candidates(self, rows):
+        data = self.__data
+        if rows == None:
+            return data.items() if isinstance(data, dict) else enumerate(data)
+        return ((row, data[row]) for row in rows)
+    
+    def _accepts(self, key):
+        if key not in self.__data:
+            return False
+        plan = self._plan()
+        if plan['rows'] != None and key not in plan['rows']:
+            return False
+        value = self.__data[key]
+        for matcher in plan['matchers']:
+            if not matcher(value):
+                return False
+        return True
+    
+    def _scan(self, kw):
+        if self.is_materialised() and not kw:
+            return self._candidates(self._selection())
+        if instrument.enabled:
+            instrument.count('iterator.scans')
+        return self._scan_plan(self._plan(kw))
+    
+    def _scan_plan(self, plan):
+        pairs = self._candidates(plan['rows'])
+        matchers = plan['matchers']
+        if instrument.enabled and matchers:
+            matchers = [instrument.counted('items.scanned', matchers[0])] + matchers[1:]
+        if not matchers:
+            yield from pairs
+            return
+        if len(matchers) == 1:
+            matcher = matchers[0]
+            for key, value in pairs:
+                if matcher(value):
+                    yield key, value
+            return
+        for key, value in pairs:
+            for matcher in matchers:
+                if not matcher(value):
+                    break
+            else:
+                yield key, value
+    
+    def _stream(self, **kw):
         if self.is_dict():
-            self.__filtered = {}
-            for key, value in self.__data.items():
-                if matches(value, **self.__criteria):
-                    self.__filtered[key] = value
-                    count = count + 1
+            for key, value in self._scan(kw):
+                yield key
         else:
-            self.__filtered = []
-            for item in self.__data:
-                if matches(item, **self.__criteria):
-                    self.__filtered.append(item)
-                    count = count + 1
-        self.__length = count
-        return count
+            for key, value in self._scan(kw):
+                yield value
+                    
+    def _stream_values(self, **kw):
+        for key, value in self._scan(kw):
+            yield value
+    
+    def _apply_filter(self):
+        started = time.perf_counter() if instrument.enabled else None
+        plan = self._plan()
+        return self._store_selection(plan, [key for key, value in self._scan_plan(plan)], started)
+    
+    async def _amaterialise(self, chunk_size=None):
+        if self.is_materialised():
+            return self
+        chunk_size = chunk_size or async_chunk_size
+        started = time.perf_counter() if instrument.enabled else None
+        plan = self._plan()
+        rows = plan['rows']
+        if rows == None:
+            rows = tuple(self.__data) if self.is_dict() else range(len(self.__data))
+        selected = []
+        for start in range(0, len(rows), chunk_size):
+            selected.extend(key for key, value in self._scan_plan(dict(plan, rows=rows[start:start + chunk_size])))
+            await asyncio.sleep(0)
+        if self.__selected == None:
+            self._store_selection(plan, selected, started)
+        return self
+    
+    def _store_selection(self, plan, selected, started):
+        selected = tuple(selected) if self.is_dict() else array('I', selected)
+        if started != None:
+            instrument.count('iterator.materialised')
+            instrument.count('plan.' + plan['driver'])
+            instrument.count('iterator.materialise.seconds', time.perf_counter() - started)
+        self.__selected = selected
+        self.__length = len(selected)
+        if self.__cache_key != None:
+            self.__source._cache_put(self.__cache_key, selected)
+            self.__cache_key = None
+        return self.__length
     
     def _get_length(self):
-        if self.__criteria:
-            if self.__filtered:
-                return self.__length
-            return self._apply_filter()  
-        return len(self.__data)
+        rows = self._selection()
+        return len(self.__data) if rows == None else len(rows)
+    
+    async def __aiter__(self):
+        await self._amaterialise()
+        data = self.__data
+        rows = self._selection()
+        if rows == None:
+            items = iter(data)
+        else:
+            items = iter(rows) if self.is_dict() else map(data.__getitem__, rows)
+        chunk_size = async_chunk_size
+        for position, item in enumerate(items, 1):
+            yield item
+            if position % chunk_size == 0:
+                await asyncio.sleep(0)
 
     def __len__(self):
-        self.__length = self.__length if self.__length else self._get_length()
-        return self.__length
+        if self.__length != None:
+            return self.__length
+        length = self._get_length()
+        if self.__pending or self.__rows != None:
+            self.__length = length
+        return length
+    
+    def _is_member(self, key):
+        rows = self._selection()
+        if rows == None:
+            return key in self.__data
+        if self.__members == None:
+            self.__members = frozenset(rows)
+        return key in self.__members
     
     def __getitem__(self, index):
-        if self.is_list():
-            if index < 0 or index >= self.__len__():
-                raise IndexError('Index [{index}] out of range'.format(index=index))
-        if self.__criteria:
-            if not self.__filtered:
-                self._apply_filter()
-            return self.__filtered[index]
-        return self.__data[index]
+        if self.is_materialised():
+            rows = self._selection()
+            if self.is_list():
+                length = len(self.__data) if rows == None else len(rows)
+                if index < 0 or index >= length:
+                    raise IndexError('Index [{index}] out of range'.format(index=index))
+                return self.__data[index if rows == None else rows[index]]
+            if rows != None and not self._is_member(index):
+                raise KeyError(index)
+            return self.__data[index]
+        if self.is_dict():
+            if not self._accepts(index):
+                raise KeyError(index)
+            return self.__data[index]
+        if index >= 0:
+            for position, item in enumerate(self._stream()):
+                if position == index:
+                    return item
+        raise IndexError('Index [{index}] out of range'.format(index=index))
     
     def __contains__(self, item):
-        return self._invoke_data_method('__contains__', item)
-    
-    def _invoke_data_method(self, method, *args, **kw):
-        if self.__criteria:
-            if not self.__filtered:
-                self._apply_filter()
-            data = self.__filtered
-        else:
-            data = self.__data
-        return getattr(data, method)(*args, **kw)
-        
+        if self.is_dict():
+            if self.is_materialised():
+                return self._is_member(item)
+            return self._accepts(item)
+        if self.is_materialised() and self._selection() == None:
+            return self.__data.__contains__(item)
+        for i in self._stream():
+            if i is item or i == item:
+                return True
+        return False
     
     def keys(self):
-        return self._invoke_data_method('keys')
+        rows = self._selection()
+        if rows == None or not self.is_dict():
+            return self.__data.keys()
+        return rows
         
     def values(self):
-        return self._invoke_data_method('values')
+        rows = self._selection()
+        if rows == None or not self.is_dict():
+            return self.__data.values()
+        data = self.__data
+        return [data[key] for key in rows]
     
     def items(self):
-        return self._invoke_data_method('items')
+        rows = self._selection()
+        if rows == None or not self.is_dict():
+            return self.__data.items()
+        data = self.__data
+        return [(key, data[key]) for key in rows]
     
     def copy(self):
-        return self._invoke_data_method('copy')
+        rows = self._selection()
+        if rows == None:
+            return self.__data.copy()
+        data = self.__data
+        if self.is_dict():
+            return {key: data[key] for key in rows}
+        return [data[row] for row in rows]
+    
+    def first(self):
+        for value in self._stream_values():
+            return value
+        return None
+    
+    def exists(self):
+        for value in self._stream():
+            return True
+        return False
     
     def get(self, item=None, **kw):
-        if self.__criteria:
-            if not self.__filtered:
-                self._apply_filter()
-            data = self.__filtered
-        else:
-            data = self.__data   
         if item:
             if self.is_dict():
-                value = data.get(item, None)
-                if value != None:
-                    return value
+                if item in self and self.__data[item] != None:
+                    return self.__data[item]
             else:
-                for i in data:
+                for i in self._stream():
                     if item == i:
                         return i
             raise DoesNotExist('The item: {item} does not exist in the embedded data'.format(item=item))
         else:
-            if self.is_dict():
-                for key, value in data.items():
-                    if matches(value, **kw):
-                        return value
-            else:
-                for i in data:
-                    if matches(i, **kw):
-                        return i
+            for value in self._stream_values(**kw):
+                return value
             raise DoesNotExist('The embedded does not include an item with keys {keys}'.format(
                     keys = kw
                 ))
                
     def filter(self, **kw):
-        criteria = self.__criteria if self.__criteria else {}
-        criteria.update(kw)
-        return EmbeddedIterator(self.__data, **criteria)
+        if self.is_materialised():
+            return EmbeddedIterator(self.__data, self._selection(), self.__source, None, **kw)
+        return EmbeddedIterator(self.__data, self.__rows, self.__source, self, **kw)
 
 def matches(item, **kw):
+    if instrument.enabled:
+        instrument.count('matches.calls')
     for key, value in kw.items():
+        key, lookup = split_lookup(key)
         if isinstance(value, F):
             value = value.evaluate(item)
         if hasattr(item, key):
-            if value != getattr(item, key):
+            if lookup == 'exact':
+                if value != getattr(item, key):
+                    return False
+            elif not _compare(lookup, getattr(item, key), value):
                 return False
         else:
             return False
     return True
 
+def _in(value, options):
+    return value in options
+
+def _range(value, bounds):
+    return bounds[0] <= value <= bounds[1]
+
+LOOKUPS = {
+    'exact': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': _in,
+    'range': _range
+}
+
+def split_lookup(key):
+    name, separator, lookup = key.rpartition('__')
+    if separator and name and lookup in LOOKUPS:
+        return name, lookup
+    return key, 'exact'
+
+def _compare(lookup, value, expected):
+    try:
+        return LOOKUPS[lookup](value, expected)
+    except TypeError:
+        return False
+
+def _check_rank(check):
+    name, value = check
+    if value is None or isinstance(value, bool):
+        return 1
+    return 0
+
+class Matcher(object):
+    
+    def __init__(self, criteria, selectivity=None):
+        self.criteria = criteria
+        constants = []
+        comparisons = []
+        references = []
+        for key, value in criteria.items():
+            name, lookup = split_lookup(key)
+            if isinstance(value, F):
+                references.append((name, lookup, value))
+            elif lookup == 'exact':
+                constants.append((name, value))
+            else:
+                comparisons.append((name, lookup, value))
+        if selectivity:
+            constants.sort(key=lambda check: selectivity.get(check[0], 1.0))
+        else:
+            constants.sort(key=_check_rank)
+        self.names = tuple(
+            [name for name, value in constants] +
+            [name for name, lookup, value in comparisons] +
+            [name for name, lookup, value in references])
+        self.__getter = None
+        self.__values = None
+        if constants:
+            self.__getter = attrgetter(*[name for name, value in constants])
+            if len(constants) == 1:
+                self.__values = constants[0][1]
+            else:
+                self.__values = tuple([value for name, value in constants])
+        self.__comparisons = [(attrgetter(name), LOOKUPS[lookup], value) for name, lookup, value in comparisons]
+        self.__references = [(attrgetter(name), LOOKUPS[lookup], value) for name, lookup, value in references]
+        
+    def __call__(self, item):
+        if self.__getter != None:
+            try:
+                if self.__values != self.__getter(item):
+                    return False
+            except AttributeError:
+                return False
+        for getter, compare, value in self.__comparisons:
+            try:
+                if not compare(getter(item), value):
+                    return False
+            except (AttributeError, TypeError):
+                return False
+        for getter, compare, reference in self.__references:
+            value = reference.evaluate(item)
+            try:
+                if not compare(getter(item), value):
+                    return False
+            except (AttributeError, TypeError):
+                return False
+        return True
+    
+class HashIndex(object):
+    
+    def __init__(self, names):
+        if isinstance(names, str):
+            names = (names,)
+        if len(names) == 0:
+            raise ValueError('An index must name at least one attribute')
+        self.names = tuple(names)
+        self.usable = True
+        self.__getter = attrgetter(*self.names)
+        self.__buckets = {}
+        
+    def __len__(self):
+        return len(self.__buckets)
+        
+    def covers(self, criteria):
+        for name in self.names:
+            if name not in criteria or isinstance(criteria[name], F):
+                return False
+        return True
+    
+    def _key(self, values):
+        if len(self.names) == 1:
+            return values[0]
+        return tuple(values)
+        
+    def add(self, row, item):
+        if not self.usable:
+            return
+        try:
+            key = self.__getter(item)
+            bucket = self.__buckets.get(key)
+        except AttributeError:
+            return
+        except TypeError:
+            self.usable = False
+            self.__buckets = {}
+            return
+        if bucket == None:
+            self.__buckets[key] = [row]
+        elif bucket[-1] < row:
+            bucket.append(row)
+        else:
+            bisect.insort(bucket, row)
+            
+    def remove(self, row, item):
+        if not self.usable:
+            return
+        try:
+            key = self.__getter(item)
+        except AttributeError:
+            return
+        bucket = self.__buckets.get(key)
+        if bucket == None:
+            return
+        position = bisect.bisect_left(bucket, row)
+        if position < len(bucket) and bucket[position] == row:
+            del bucket[position]
+            if len(bucket) == 0:
+                del self.__buckets[key]
+        
+    def lookup(self, criteria):
+        try:
+            return self.__buckets.get(self._key([criteria[name] for name in self.names]), [])
+        except TypeError:
+            return None
+        
+    def plan(self, criteria):
+        if not self.usable or not self.covers(criteria):
+            return None
+        rows = self.lookup(criteria)
+        if rows == None:
+            return None
+        return rows, self.names
+        
+    def clear(self):
+        self.usable = True
+        self.__buckets = {}
+        
+
+class SortedIndex(object):
+    
+    LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'range')
+    
+    def __init__(self, name):
+        self.name = name
+        self.names = (name,)
+        self.usable = True
+        self.__entries = []
+        
+    def __len__(self):
+        return len(self.__entries)
+        
+    def add(self, row, item):
+        if not self.usable:
+            return
+        value = getattr(item, self.name, None)
+        if value == None:
+            return
+        entry = (value, row)
+        try:
+            if not self.__entries or self.__entries[-1] < entry:
+                self.__entries.append(entry)
+            else:
+                bisect.insort(self.__entries, entry)
+        except TypeError:
+            self.usable = False
+            self.__entries = []
+            
+    def remove(self, row, item):
+        if not self.usable:
+            return
+        value = getattr(item, self.name, None)
+        if value == None:
+            return
+        position = bisect.bisect_left(self.__entries, (value, row))
+        if position < len(self.__entries) and self.__entries[position] == (value, row):
+            del self.__entries[position]
+            
+    def _bounds(self, constraints):
+        lower = 0
+        upper = len(self.__entries)
+        for lookup, value in constraints:
+            if lookup in ('exact', 'gte', 'gt'):
+                if lookup == 'gt':
+                    position = bisect.bisect_right(self.__entries, (value, float('inf')))
+                else:
+                    position = bisect.bisect_left(self.__entries, (value,))
+                lower = max(lower, position)
+            if lookup in ('exact', 'lte', 'lt'):
+                if lookup == 'lt':
+                    position = bisect.bisect_left(self.__entries, (value,))
+                else:
+                    position = bisect.bisect_right(self.__entries, (value, float('inf')))
+                upper = min(upper, position)
+            if lookup == 'range':
+                lower = max(lower, bisect.bisect_left(self.__entries, (value[0],)))
+                upper = min(upper, bisect.bisect_right(self.__entries, (value[1], float('inf'))))
+        return lower, upper
+        
+    def plan(self, criteria):
+        if not self.usable:
+            return None
+        constraints = []
+        consumed = []
+        for key, value in criteria.items():
+            name, lookup = split_lookup(key)
+            if name != self.name or lookup not in self.LOOKUPS or isinstance(value, F):
+                continue
+            if value == None or (lookup == 'range' and (value[0] == None or value[1] == None)):
+                continue
+            constraints.append((lookup, value))
+            consumed.append(key)
+        if not constraints:
+            return None
+        try:
+            lower, upper = self._bounds(constraints)
+        except TypeError:
+            return None
+        if upper <= lower:
+            return [], tuple(consumed)
+        return sorted([row for value, row in self.__entries[lower:upper]]), tuple(consumed)
+    
+    def clear(self):
+        self.usable = True
+        self.__entries = []
+
+
+_int64 = (-2 ** 63, 2 ** 63)
+
+def _column_kind(value):
+    kind = type(value)
+    if kind is bool:
+        return 'bool'
+    if kind is int:
+        return 'int' if _int64[0] <= value < _int64[1] else None
+    if kind is float:
+        return 'float'
+    if kind is str:
+        return 'str' if not value.endswith('\x00') else None
+    return None
+
+class ColumnStore(object):
+    
+    LOOKUPS = ('exact', 'ne', 'gt', 'gte', 'lt', 'lte', 'in', 'range')
+    SCAN_RATIO = 32
+    
+    def __init__(self, names=None):
+        if numpy == None:
+            raise ImportError('numpy is required for columnar EmbeddedManager storage')
+        self.declared = tuple(names) if names != None else None
+        self.clear()
+        
+    def __len__(self):
+        return self.__count
+    
+    def columns(self):
+        return tuple(self.__kinds) if self.__kinds else ()
+        
+    def clear(self):
+        self.usable = True
+        self._reset()
+        
+    def _reset(self):
+        self.__count = 0
+        self.__kinds = None
+        self.__arrays = {}
+        self.__pending = {}
+        
+    def _declare(self, item):
+        self.__kinds = {}
+        names = self.declared if self.declared != None else attribute_names(item)
+        for name in names:
+            kind = _column_kind(getattr(item, name, None))
+            if kind != None:
+                self.__kinds[name] = kind
+                self.__arrays[name] = None
+                self.__pending[name] = []
+            
+    def _drop(self, name):
+        del self.__kinds[name]
+        del self.__arrays[name]
+        del self.__pending[name]
+        
+    def add(self, row, item):
+        if not self.usable:
+            return
+        if row != self.__count:
+            self.usable = False
+            self._reset()
+            return
+        if self.__kinds == None:
+            self._declare(item)
+        for name, kind in list(self.__kinds.items()):
+            value = getattr(item, name, None)
+            if _column_kind(value) != kind:
+                self._drop(name)
+            else:
+                self.__pending[name].append(value)
+        self.__count = self.__count + 1
+        
+    def remove(self, row, item):
+        self.usable = False
+        self._reset()
+        
+    def column(self, name):
+        pending = self.__pending[name]
+        if pending:
+            kind = self.__kinds[name]
+            if kind == 'int':
+                values = numpy.array(pending, dtype=numpy.int64)
+            elif kind == 'float':
+                values = numpy.array(pending, dtype=numpy.float64)
+            else:
+                values = numpy.array(pending)
+            if values.dtype.kind not in 'bifU':
+                self._drop(name)
+                return None
+            array = self.__arrays[name]
+            self.__arrays[name] = values if array is None else numpy.concatenate((array, values))
+            self.__pending[name] = []
+        return self.__arrays[name]
+    
+    def _supports(self, kind, lookup, value):
+        if lookup == 'in':
+            return len(value) > 0 and all(_column_kind(option) == kind for option in value)
+        if lookup == 'range':
+            return _column_kind(value[0]) == kind and _column_kind(value[1]) == kind
+        return _column_kind(value) == kind
+    
+    def _mask(self, array, lookup, value):
+        if lookup == 'exact':
+            return array == value
+        if lookup == 'ne':
+            return array != value
+        if lookup == 'gt':
+            return array > value
+        if lookup == 'gte':
+            return array >= value
+        if lookup == 'lt':
+            return array < value
+        if lookup == 'lte':
+            return array <= value
+        if lookup == 'in':
+            return numpy.isin(array, list(value))
+        return (array >= value[0]) & (array <= value[1])
+        
+    def plan(self, criteria):
+        if not self.usable or not self.__kinds or self.__count == 0:
+            return None
+        mask = None
+        consumed = []
+        for key, value in criteria.items():
+            name, lookup = split_lookup(key)
+            kind = self.__kinds.get(name)
+            if kind == None or lookup not in self.LOOKUPS or isinstance(value, F):
+                continue
+            if not self._supports(kind, lookup, value):
+                continue
+            array = self.column(name)
+            if array is None:
+                continue
+            selected = self._mask(array, lookup, value)
+            mask = selected if mask is None else mask & selected
+            consumed.append(key)
+        if mask is None:
+            return None
+        return numpy.flatnonzero(mask).tolist(), tuple(consumed)
+
+
+class EmbeddedView(EmbeddedIterator):
+    
+    __slots__ = ('__manager', '__criteria', '__matcher', '__items', '__weakref__')
+    
+    def __init__(self, manager, **kw):
+        self.__manager = manager
+        self.__criteria = kw
+        self.__matcher = Matcher(kw)
+        self.__items = {} if manager.is_dict() else []
+        EmbeddedIterator.__init__(self, self.__items)
+        self.refresh()
+        
+    def criteria(self):
+        return dict(self.__criteria)
+        
+    def _selection(self):
+        self.__manager._catch_up()
+        return EmbeddedIterator._selection(self)
+    
+    def refresh(self):
+        matcher = self.__matcher
+        data = self.__manager._synced_data()
+        if isinstance(self.__items, dict):
+            self.__items.clear()
+            if isinstance(data, dict):
+                self.__items.update((key, value) for key, value in data.items() if matcher(value))
+        else:
+            del self.__items[:]
+            if not isinstance(data, dict):
+                self.__items.extend(item for item in data if matcher(item))
+                
+    def _get_length(self):
+        self.__manager._catch_up()
+        return len(self.__items)
+    
+    def __len__(self):
+        self.__manager._catch_up()
+        return len(self.__items)
+        
+    def _added(self, item):
+        if self.__matcher(item):
+            self.__items.append(item)
+            
+    def _updated(self, key, value, existed):
+        items = self.__items
+        if not self.__matcher(value):
+            items.pop(key, None)
+        elif key in items or not existed:
+            items[key] = value
+        else:
+            ordered = [(name, value if name == key else items[name]) for name in self.__manager._synced_data() if name == key or name in items]
+            items.clear()
+            items.update(ordered)
+            
+
+def _freeze_value(value):
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple([_freeze_value(item) for item in value]))
+    if isinstance(value, (set, frozenset)):
+        return (type(value), frozenset([_freeze_value(item) for item in value]))
+    if isinstance(value, dict):
+        return (type(value), tuple(sorted((key, _freeze_value(item)) for key, item in value.items())))
+    return (type(value), value)
+
+class ResultCache(object):
+    
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.__entries)
+    
+    def key(self, kind, version, criteria):
+        try:
+            frozen = tuple(sorted((key, _freeze_value(value)) for key, value in criteria.items()))
+            hash(frozen)
+        except TypeError:
+            return None
+        return (kind, version, frozen)
+    
+    def get(self, key, default=None):
+        with self.__lock:
+            value = self.__entries.get(key, _missing)
+            if value is _missing:
+                self.misses = self.misses + 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits = self.hits + 1
+            return value
+        
+    def put(self, key, value):
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            
+    def info(self):
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.__entries),
+                'maxsize': self.maxsize
+            }
+
+_not_found = object()
+
 class EmbeddedManager(object):
     
-    def __init__(self, data=[], **kw):
-        self.__data = data
+    __slots__ = ('__data', '__type', '__indexes', '__rows', '__row_of', '__views', '__executor', '__version', '__cache', '__synced', '__weakref__')
+    
+    def __init__(self, data=None, **kw):
+        self.__data = data if data != None else []
         self.__type = kw.get('type', None)
-        self.__length = None
+        self.__indexes = ()
+        self.__rows = None
+        self.__row_of = None
+        self.__views = None
+        self.__executor = kw.get('executor', None)
+        self.__version = 0
+        self.__cache = None
+        if kw:
+            cache = kw.get('cache', None)
+            if cache:
+                self.__cache = ResultCache() if cache == True else ResultCache(cache)
+            indexes = [HashIndex(names) for names in kw.get('indexes', [])]
+            indexes.extend([SortedIndex(name) for name in kw.get('sorted_indexes', [])])
+            columns = kw.get('columns', None)
+            if columns:
+                indexes.append(ColumnStore(None if columns == True else columns))
+            if indexes:
+                self.__indexes = indexes
+        self._rebuild_indexes()
         
     def is_dict(self):
         return isinstance(self.__data, dict)
         
     def is_list(self):
-        return isinstance(self.__data, list)
+        return isinstance(self.__data, _list_types)
+    
+    def indexes(self):
+        return [index.names for index in self.__indexes if isinstance(index, HashIndex)]
+    
+    def sorted_indexes(self):
+        return [index.name for index in self.__indexes if isinstance(index, SortedIndex)]
+    
+    def columns(self):
+        for index in self.__indexes:
+            if isinstance(index, ColumnStore) and index.usable:
+                return index.columns()
+        return ()
+    
+    def reindex(self):
+        self._rebuild_indexes()
+        
+    def _synced_data(self):
+        if self.__synced == None:
+            return self.__data
+        return islice(self.__data, self.__synced)
+    
+    def _catch_up(self):
+        synced = self.__synced
+        if synced == None:
+            return
+        count = len(self.__data)
+        if count <= synced:
+            return
+        self.__synced = count
+        self._changed()
+        items = self.__data[synced:count]
+        if self.__indexes:
+            for row, item in enumerate(items, synced):
+                self._index_add(row, item)
+        if self.__views:
+            views = list(self.__views)
+            for item in items:
+                for view in views:
+                    view._added(item)
+    
+    def _rebuild_indexes(self):
+        self.__synced = len(self.__data) if isinstance(self.__data, MappedList) else None
+        if not self.__indexes:
+            return
+        for index in self.__indexes:
+            index.clear()
+        if self.is_dict():
+            self.__rows = list(self.__data)
+            self.__row_of = {key: row for row, key in enumerate(self.__rows)}
+            for row, key in enumerate(self.__rows):
+                self._index_add(row, self.__data[key])
+        else:
+            self.__rows = None
+            self.__row_of = None
+            for row, item in enumerate(self._synced_data()):
+                self._index_add(row, item)
+                
+    def _index_add(self, row, item):
+        for index in self.__indexes:
+            index.add(row, item)
+            
+    def _index_remove(self, row, item):
+        for index in self.__indexes:
+            index.remove(row, item)
+            
+    def _index_lookup(self, criteria, candidates=None):
+        self._catch_up()
+        best = None
+        for index in self.__indexes:
+            if best != None:
+                candidates = len(best[0]) if candidates == None else min(candidates, len(best[0]))
+            if candidates != None and isinstance(index, ColumnStore) and candidates * index.SCAN_RATIO <= len(index):
+                continue
+            plan = index.plan(criteria)
+            if plan == None:
+                continue
+            if best == None or len(plan[0]) < len(best[0]):
+                best = plan
+        if best == None:
+            return None
+        rows, consumed = best
+        remaining = {key: value for key, value in criteria.items() if key not in consumed}
+        if self.is_dict():
+            keys = self.__rows
+            return tuple([keys[row] for row in rows]), remaining
+        return array('I', rows), remaining
         
     def _get_length(self):
         return len(self.__data)
 
     def __len__(self):
-        self.__length = self.__length if self.__length else self._get_length()
-        return self.__length
+        return len(self.__data)
     
     def __contains__(self, item):
         return self.__data.__contains__(item)
         
     def all(self):
-        return EmbeddedIterator(self.__data)
+        self._catch_up()
+        return EmbeddedIterator(self.__data, None, self)
     
     def get(self, item=None, **kw):
         if item:
@@ -326,42 +1363,199 @@ class EmbeddedManager(object):
                     if item == i:
                         return i
                 raise DoesNotExist('The item: {item} does not exist in the embedded data'.format(item=item))
+        self._catch_up()
+        key, value = self._cached('get', kw)
+        if key == None:
+            return self._get(kw)
+        if value is _missing:
+            try:
+                value = self._get(kw)
+            except DoesNotExist:
+                self.__cache.put(key, _not_found)
+                raise
+            self.__cache.put(key, value)
+        elif value is _not_found:
+            raise DoesNotExist('The embedded data does not include an item with keys {keys}'.format(
+                    keys = kw
+                ))
+        return value
+    
+    def _get(self, kw):
+        data = self.__data
+        indexed = self._index_lookup(kw) if self.__indexes else None
+        if indexed != None:
+            rows, kw = indexed
+            data = map(data.__getitem__, rows)
+        matcher = Matcher(kw)
+        if instrument.enabled:
+            instrument.count('manager.get')
+            instrument.count('manager.get.indexed' if indexed != None else 'manager.get.unindexed')
+            matcher = instrument.counted('items.scanned', matcher)
+        if isinstance(data, dict):
+            for value in data.values():
+                if matcher(value):
+                    return value
+            raise DoesNotExist('The embedded data does not include an item with keys {keys}'.format(
+                    keys = kw
+                ))
+            
         else:
-            if isinstance(self.__data, dict):
-                for key, value in self.__data.items():
-                    if matches(value, **kw):
-                        return value
-                raise DoesNotExist('The embedded data does not include an item with keys {keys}'.format(
-                        keys = kw
-                    ))
-                
-            else:
-                for i in self.__data:
-                    if matches(i, **kw):
-                        return i
-                raise DoesNotExist('The embedded data does not include an item with keys {keys}'.format(
-                        keys = kw
-                    ))
+            for i in data:
+                if matcher(i):
+                    return i
+            raise DoesNotExist('The embedded data does not include an item with keys {keys}'.format(
+                    keys = kw
+                ))
+           
+    def view(self, **kw):
+        self._catch_up()
+        view = EmbeddedView(self, **kw)
+        if self.__views == None:
+            self.__views = weakref.WeakSet()
+        self.__views.add(view)
+        return view
+    
+    def _notify_reset(self):
+        if self.__views:
+            for view in list(self.__views):
+                view.refresh()
                
+    def __getstate__(self):
+        maxsize = self.__cache.maxsize if self.__cache != None else None
+        return (self.__data, self.__type, self.__indexes, self.__rows, self.__row_of, self.__executor, self.__version, maxsize)
+    
+    def __setstate__(self, state):
+        self.__data, self.__type, self.__indexes, self.__rows, self.__row_of, self.__executor, self.__version, maxsize = state
+        self.__cache = ResultCache(maxsize) if maxsize else None
+        self.__views = None
+        self.__synced = len(self.__data) if isinstance(self.__data, MappedList) else None
+    
+    def version(self):
+        return self.__version
+    
+    def cache_info(self):
+        return self.__cache.info() if self.__cache != None else None
+    
+    def _changed(self):
+        self.__version = self.__version + 1
+        if self.__cache != None:
+            self.__cache.clear()
+    
+    def executor(self):
+        return self.__executor
+    
+    def _cached(self, kind, kw):
+        cache = self.__cache
+        key = cache.key(kind, self.__version, kw) if cache != None else None
+        if key == None:
+            return None, _missing
+        value = cache.get(key, _missing)
+        if instrument.enabled:
+            instrument.count('manager.cache.misses' if value is _missing else 'manager.cache.hits')
+        return key, value
+    
     def filter(self, **kw):
-        return EmbeddedIterator(self.__data, **kw)
+        self._catch_up()
+        key, rows = self._cached('filter', kw)
+        if rows is not _missing:
+            return EmbeddedIterator(self.__data, rows, self)
+        iterator = self._filter(kw)
+        if key != None:
+            iterator._cache_as(key)
+        return iterator
+    
+    def _cache_put(self, key, rows):
+        if self.__cache != None:
+            self.__cache.put(key, rows)
+    
+    async def afilter(self, **kw):
+        self._catch_up()
+        key, rows = self._cached('filter', kw)
+        if rows is not _missing:
+            return EmbeddedIterator(self.__data, rows, self)
+        executor = self.__executor
+        if executor != None and self.is_list() and executor.parallel(self.__data):
+            iterator = await asyncio.get_running_loop().run_in_executor(None, self._filter, kw)
+        else:
+            iterator = self._filter(kw)
+        if key != None:
+            iterator._cache_as(key)
+        await iterator._amaterialise()
+        return iterator
+    
+    def _filter(self, kw):
+        data = self.__data
+        rows = None
+        if self.__indexes:
+            indexed = self._index_lookup(kw)
+            if indexed != None:
+                rows, kw = indexed
+        executor = self.__executor
+        counting = instrument.enabled
+        if counting:
+            instrument.count('manager.filter')
+            instrument.count('manager.filter.indexed' if rows != None else 'manager.filter.unindexed')
+        if executor != None and kw and rows == None and self.is_list() and executor.parallel(data):
+            if counting:
+                instrument.count('manager.filter.parallel')
+                instrument.count('items.scanned', len(data))
+            return EmbeddedIterator(data, array('I', executor.positions(data, kw)), self)
+        return EmbeddedIterator(data, rows, self, None, **kw)
+    
+    def explain(self, **kw):
+        return self.all().explain(**kw)
     
     def append(self, item):
+        if self.__synced != None:
+            self.__data.append(item)
+            self._catch_up()
+            return item
         self.__data.append(item)
-        if self.__length:
-            self.__length = self.__length + 1
+        self._changed()
+        if self.__indexes:
+            self._index_add(len(self.__data) - 1, item)
+        if self.__views:
+            for view in list(self.__views):
+                view._added(item)
         return item
     
     def extend(self, iterable):
+        if self.__synced != None:
+            self.__data.extend(iterable)
+            self._catch_up()
+            return
+        start = len(self.__data)
         self.__data.extend(iterable)
-        if self.__length:
-            self.__length = self.__length + len(iterable)
+        self._changed()
+        if self.__indexes:
+            for row in range(start, len(self.__data)):
+                self._index_add(row, self.__data[row])
+        if self.__views:
+            views = list(self.__views)
+            for row in range(start, len(self.__data)):
+                item = self.__data[row]
+                for view in views:
+                    view._added(item)
     
     def update(self, dct):
+        if self.__indexes and self.is_dict():
+            for key, value in dct.items():
+                if key in self.__row_of:
+                    row = self.__row_of[key]
+                    self._index_remove(row, self.__data[key])
+                else:
+                    row = len(self.__rows)
+                    self.__rows.append(key)
+                    self.__row_of[key] = row
+                self._index_add(row, value)
+        existed = set([key for key in dct if key in self.__data]) if self.__views else None
         self.__data.update(dct)
-        if self.__length:
-            self.__length = None
-            self.__length = len(self)
+        self._changed()
+        if self.__views:
+            views = list(self.__views)
+            for key, value in dct.items():
+                for view in views:
+                    view._updated(key, value, key in existed)
             
     def keys(self):
         return self.__data.keys()
@@ -374,6 +1568,9 @@ class EmbeddedManager(object):
         
     def copy(self):
         return self.__data.copy()
+    
+    def data(self):
+        return self.__data
         
     def create(self, *args, **kw):
         if not self.__type:
@@ -388,16 +1585,78 @@ class EmbeddedManager(object):
             return new
     def set(self, data):
         self.__data = data
-        self.__length = None
+        self._changed()
+        self._rebuild_indexes()
+        self._notify_reset()
         
     def clear(self):
         self.__data = []
-        self.__length = 0
+        self._changed()
+        self._rebuild_indexes()
+        self._notify_reset()
+        
+
+class AttributeSchema(object):
+    
+    def __init__(self, cls):
+        self.declared = getattr(cls, '__traversable__', None)
+        if self.declared != None:
+            self.declared = tuple(self.declared)
+        self.reflect = getattr(cls, '__dir__', object.__dir__) is not object.__dir__
+        names = set()
+        seen = set()
+        for klass in cls.__mro__:
+            for name, attr in vars(klass).items():
+                if name in seen:
+                    continue
+                seen.add(name)
+                if name[0] == '_' or callable(attr):
+                    continue
+                if isinstance(attr, (staticmethod, classmethod)):
+                    continue
+                names.add(name)
+        self.names = tuple(sorted(names))
         
+    def attribute_names(self, obj):
+        if self.declared != None:
+            return self.declared
+        if self.reflect:
+            if instrument.enabled:
+                instrument.count('schema.reflections')
+            return tuple([name for name in dir(obj) if name[0] != '_' and not callable(getattr(obj, name))])
+        instance = getattr(obj, '__dict__', None)
+        if not instance:
+            return self.names
+        names = set(self.names)
+        for name, value in instance.items():
+            if name[0] != '_' and not callable(value):
+                names.add(name)
+        return sorted(names)
+
+_schemas = weakref.WeakKeyDictionary()
+
+def attribute_schema(cls):
+    schema = _schemas.get(cls)
+    if schema == None:
+        if instrument.enabled:
+            instrument.count('schema.builds')
+        schema = AttributeSchema(cls)
+        _schemas[cls] = schema
+    return schema
+
+def attribute_names(obj):
+    return attribute_schema(type(obj)).attribute_names(obj)
+
+
+_missing = object()
 
 class FinderExpression(Expression):
+    
+    __slots__ = ('max_depth',)
+    
     def __init__(self, path, **kw):
         super(FinderExpression, self).__init__(path, **kw)
+        self.max_depth = kw.get('max_depth', None)
         if '*' in self.name and (self.name not in ['*', '**']):
             raise ValueError('Invalid syntax in path: {path} at "{name}"'.format(
                     path=path,
@@ -414,200 +1673,307 @@ class FinderExpression(Expression):
                     name=self.name
                 ))
         
-    def _evaluate_obj(self, obj, name):
-        resp = []
-        if not hasattr(obj, name):
-            return []
-        value = getattr(obj, name)
-        if isinstance(value, list) or isinstance(value, dict):
+    def _iter_obj(self, obj, name, scope):
+        tracing = trace.enabled
+        value = getattr(obj, name, _missing)
+        if value is _missing:
+            return
+        if isinstance(value, _list_types) or isinstance(value, dict):
             value = EmbeddedManager(value)
         if isinstance(value, EmbeddedManager):
-            logger.debug('Value is an EmbeddedManager')
+            if tracing:
+                trace('Value is an EmbeddedManager')
             if self.criteria:
-                logger.debug('EmbeddedManager with criteria: {crit}'.format(crit=self.criteria))
-                try:
-                    if value.is_list():
-                        values = value.filter(**self.criteria).copy()
-                    elif value.is_dict():
-                        values = [item for item in value.filter(**self.criteria).values()]
-                    else:
-                        values = []
-                except DoesNotExist:
-                    values = []
+                if tracing:
+                    trace('EmbeddedManager with criteria: {crit}', crit=self.criteria)
+                if value.is_list() or value.is_dict():
+                    values = value.filter(**self.criteria)._stream_values()
+                else:
+                    values = ()
             elif self.index != None:
-                logger.debug('EmbeddedManager with index: {idx}'.format(idx=self.index))
+                if tracing:
+                    trace('EmbeddedManager with index: {idx}', idx=self.index)
                 length = len(value)
                 if value.is_list():
                     if self.index >= length or self.index < -length:
-                        values = []
+                        values = ()
                     else:
-                        values = [value.all()[self.index]]
+                        values = (value.all()[self.index],)
                 elif value.is_dict():
                     if length == 0:
-                        values = []
+                        values = ()
                     else:
                         try:
-                            values = [value.all()[self.index]]
+                            values = (value.all()[self.index],)
                         except KeyError:
-                            values = []
+                            values = ()
                 else:
-                    values = []
+                    values = ()
             else:
-                logger.debug('EmbeddedManager without index or criteria')
-                if len(value) == 0:
-                    values = []
+                if tracing:
+                    trace('EmbeddedManager without index or criteria')
+                data = value.data()
+                if value.is_list():
+                    values = data
+                elif value.is_dict():
+                    values = data.values()
                 else:
-                    if value.is_list():
-                        values = value.all().copy()
-                    elif value.is_dict():
-                        values = [item for item in value.all().values()]
-                    else:
-                        values = []
+                    values = ()
 
         elif self.criteria:
             if matches(value, **self.criteria):
-                values = [value]
+                values = (value,)
             else:
-                values = []
+                values = ()
         else:
-            values = [value]
-        if not values:
-            return resp
-        if not self.next:
-            resp.extend(values)
-            return resp
-        resp.extend(self.next.evaluate(values))
-        return resp
+            values = (value,)
+        if self.next:
+            yield from self.next._iter_items(values, scope)
+        else:
+            yield from values
     
-    def _evaluate_open_search(self, obj, name):
-        logger.debug('Evaluating open search for name: {name}'.format(name=name))
+    def _iter_open_items(self, items, scope, visited, depth):
+        tracing = trace.enabled
         next_name = self.next.name
-        resp = []
-        if not hasattr(obj, name):
-            return resp
-        value = getattr(obj, name)
-        if isinstance(value, list) or isinstance(value, dict):
+        max_depth = self.max_depth
+        for item in items:
+            seen = visited.get(id(item))
+            if seen != None and (max_depth == None or seen[0] <= depth):
+                continue
+            visited[id(item)] = (depth, item)
+            if tracing:
+                trace('Evaluating item: {item} in collection', item=item)
+            for sub_name in attribute_names(item):
+                if tracing:
+                    trace('Evaluating item sub name: {sub} of value: {value}', sub=sub_name, value=item)
+                if sub_name == next_name:
+                    if seen == None:
+                        yield from self.next._iter_items((item,), scope)
+                else:
+                    yield from self._iter_open_search(item, sub_name, scope, visited, depth + 1)
+    
+    def _iter_open_search(self, obj, name, scope, visited, depth=1):
+        tracing = trace.enabled
+        if tracing:
+            trace('Evaluating open search for name: {name}', name=name)
+        next_name = self.next.name
+        if instrument.enabled:
+            instrument.count('find.open_search.nodes')
+        if self.max_depth != None and depth > self.max_depth:
+            return
+        value = getattr(obj, name, _missing)
+        if value is _missing:
+            return
+        seen = visited.get(id(value))
+        if seen != None and (self.max_depth == None or seen[0] <= depth):
+            return
+        if isinstance(value, _list_types) or isinstance(value, dict):
+            visited[id(value)] = (depth, value)
             value = EmbeddedManager(value)
         if isinstance(value, EmbeddedManager):
-            logger.debug('Evaluating open search {name} is a collection'.format(name=name))
+            visited[id(value)] = (depth, value)
+            if tracing:
+                trace('Evaluating open search {name} is a collection', name=name)
             if value.is_dict():
-                logger.debug('Collection is dict')
+                if tracing:
+                    trace('Collection is dict')
                 if self.criteria:
-                    logger.debug('Filtering dict with criteria: {crit}'.format(crit=self.criteria))
-                    values = [item for item in value.filter(**self.criteria).values()]
+                    if tracing:
+                        trace('Filtering dict with criteria: {crit}', crit=self.criteria)
+                    values = value.filter(**self.criteria)._stream_values()
                 elif self.index:
-                    logger.debug('Filtering dict with index {idx}'.format(idx=self.index))
+                    if tracing:
+                        trace('Filtering dict with index {idx}', idx=self.index)
                     if self.index in value:
-                        values = [value.get(self.index)]
+                        values = (value.get(self.index),)
                     else:
-                        values = []
+                        values = ()
                 else:
-                    logger.debug('No dict filtering')
-                    values = [item for item in value.all().values()]
+                    if tracing:
+                        trace('No dict filtering')
+                    values = value.data().values()
                 
             elif value.is_list():
-                logger.debug('Collection is list')
+                if tracing:
+                    trace('Collection is list')
                 if self.criteria:
-                    logger.debug('Filtering list with criteria: {crit}'.format(crit=self.criteria))
-                    logger.debug('Unfiltered values: {v}'.format(v=str([item for item in value.all()])))
-                    logger.debug('Length filtered list: {len}'.format(len=len(value.filter(**self.criteria))))
-                    values = [item for item in value.filter(**self.criteria)]
-                    logger.debug('Filtered values: {v}'.format(v=values))
+                    if tracing:
+                        trace('Filtering list with criteria: {crit}', crit=self.criteria)
+                        trace('Unfiltered values: {v}', v=list(value.all()))
+                        trace('Length filtered list: {len}', len=len(value.filter(**self.criteria)))
+                    values = value.filter(**self.criteria)._stream_values()
                 elif self.index:
-                    logger.debug('Filtering list with index: {idx}'.format(idx=self.index))
+                    if tracing:
+                        trace('Filtering list with index: {idx}', idx=self.index)
                     length = len(value)
                     if self.index >= length or self.index < -length:
-                        values = []
+                        values = ()
                     else:
-                        values = [value.all()[self.index]]
+                        values = (value.all()[self.index],)
                 else:
-                    logger.debug('No list filtering')
-                    values = value.all()
+                    if tracing:
+                        trace('No list filtering')
+                    values = value.data()
             else:
-                logger.debug('Collection is UNKNOWN')
-                values = []
-            logger.debug('Values: {values}'.format(values=str(values)))
-            for item in values:
-                logger.debug('Evaluating item: {item} in collection'.format(item=str(item)))
-                for sub_name in dir(item):
-                    if sub_name[0] == '_':
-                        continue
-                    sub_attr = getattr(item, sub_name)
-                    if callable(sub_attr):
-                        continue
-                    logger.debug('Evaluating item sub name: {sub} of value: {value}'.format(sub=sub_name, value=str(item)))
-                    if sub_name == next_name:
-                        resp.extend(self.next.evaluate(item))
-                    else:
-                        resp.extend(self._evaluate_open_search(item, sub_name))
+                if tracing:
+                    trace('Collection is UNKNOWN')
+                values = ()
+            yield from self._iter_open_items(values, scope, visited, depth)
         else:
             if (isinstance(value, str) or
                 isinstance(value, int) or
                 isinstance(value, float) or
                 isinstance(value, bool)):
-                logger.debug('Evaluating open search {name} is builtin'.format(name=name))
+                if tracing:
+                    trace('Evaluating open search {name} is builtin', name=name)
             else:
-                logger.debug('Evaluating open search {name} is NOT a collection'.format(name=name))
+                if tracing:
+                    trace('Evaluating open search {name} is NOT a collection', name=name)
                 if self.criteria:
                     if not matches(value, **self.criteria):
-                        return []
-                for sub_name in dir(value):
-                    if sub_name[0] == '_':
-                        continue
-                    sub_attr = getattr(value, sub_name)
-                    if callable(sub_attr):
-                        continue
-                    logger.debug('Evaluating sub name: {sub} of value: {value}'.format(sub=sub_name, value=str(value)))
+                        return
+                visited[id(value)] = (depth, value)
+                for sub_name in attribute_names(value):
+                    if tracing:
+                        trace('Evaluating sub name: {sub} of value: {value}', sub=sub_name, value=value)
                     if sub_name == next_name:
-                        resp.extend(self.next.evaluate(value))
+                        if seen == None:
+                            yield from self.next._iter_items((value,), scope)
                     else:
-                        resp.extend(self._evaluate_open_search(value, sub_name))
-        return resp
+                        yield from self._iter_open_search(value, sub_name, scope, visited, depth + 1)
         
-    def evaluate(self, source):
-        if isinstance(source, list):
-            data = source
-        else:
-            data = [source]
-        resp = []
+    def _iter_items(self, data, scope):
+        tracing = trace.enabled
         for obj in data:
             if self.name == '*':
-                logger.debug('Evaluating wildcard')
-                for name in dir(obj):
-                    if name[0] == '_':
-                        continue
-                    attr = getattr(obj, name)
-                    if callable(attr):
-                        continue
-                    logger.debug('Evaluating wildcard as {name}'.format(name=name))
-                    resp.extend(self._evaluate_obj(obj, name))
+                if tracing:
+                    trace('Evaluating wildcard')
+                for name in attribute_names(obj):
+                    if tracing:
+                        trace('Evaluating wildcard as {name}', name=name)
+                    yield from self._iter_obj(obj, name, scope)
             elif self.name == '**':
-                logger.debug('Evaluating open search')
-                for name in dir(obj):
-                    if name[0] == '_':
-                        continue
-                    attr = getattr(obj, name)
-                    if callable(attr):
-                        continue
-                    logger.debug('Evaluating open search as {name}'.format(name=name))
-                    resp.extend(self._evaluate_open_search(obj, name))
-                
-                
+                if tracing:
+                    trace('Evaluating open search')
+                visited = scope.setdefault(id(self), {})
+                seen = visited.get(id(obj))
+                if seen != None and (self.max_depth == None or seen[0] <= 0):
+                    continue
+                visited[id(obj)] = (0, obj)
+                for name in attribute_names(obj):
+                    if tracing:
+                        trace('Evaluating open search as {name}', name=name)
+                    yield from self._iter_open_search(obj, name, scope, visited)
             else:
-                resp.extend(self._evaluate_obj(obj, self.name))
-        return resp
+                yield from self._iter_obj(obj, self.name, scope)
+    
+    def iter_evaluate(self, source):
+        return self._iter_items(source if isinstance(source, list) else [source], {})
+        
+    def evaluate(self, source):
+        return list(self.iter_evaluate(source))
+        
+class PathTrie(object):
+    
+    def __init__(self, expression=None, **kw):
+        self.expression = expression
+        self.children = {}
+        self.paths = []
+        self.__kw = kw
         
+    def add(self, path):
+        node = self
+        expression = FinderExpression.compile(path, **self.__kw)
+        while expression != None:
+            if expression.name == '**':
+                segment = '{open}.{name}'.format(open=expression.segment, name=expression.next.segment)
+                expression = expression.next.next
+            else:
+                segment = expression.segment
+                expression = expression.next
+            child = node.children.get(segment)
+            if child == None:
+                child = PathTrie(FinderExpression.compile(segment, **self.__kw), **self.__kw)
+                node.children[segment] = child
+            node = child
+        node.paths.append(path)
+        
+    def evaluate(self, source, results):
+        if self.expression != None:
+            values = self.expression.evaluate(source)
+        else:
+            values = source if isinstance(source, list) else [source]
+        for path in self.paths:
+            results[path] = list(values)
+        for child in self.children.values():
+            if values:
+                child.evaluate(values, results)
+            else:
+                child._empty(results)
+        return results
+    
+    def _empty(self, results):
+        for path in self.paths:
+            results[path] = []
+        for child in self.children.values():
+            child._empty(results)
+        
+
 class Finder(object):
     
-    def __find__(self, path):
+    def __find__(self, path, max_depth=None):
         if path == None or len(path) == 0:
             return []
-        fe = FinderExpression(path)
-        resp = fe.evaluate(self)
-        logger.debug('Found: {resp}'.format(resp=str(resp)))
+        if max_depth != None:
+            fe = FinderExpression.compile(path, max_depth=max_depth)
+        else:
+            fe = FinderExpression.compile(path)
+        if instrument.enabled:
+            started = time.perf_counter()
+            scanned = instrument.counters.get('items.scanned', 0)
+            resp = fe.evaluate(self)
+            key = 'find[{path}]'.format(path=path)
+            instrument.count('find.calls')
+            instrument.count(key + '.calls')
+            instrument.count(key + '.results', len(resp))
+            instrument.count(key + '.scanned', instrument.counters.get('items.scanned', 0) - scanned)
+            instrument.count(key + '.seconds', time.perf_counter() - started)
+        else:
+            resp = fe.evaluate(self)
+        tracing = trace.enabled
+        if tracing:
+            trace('Found: {resp}', resp=resp)
         return resp
-        
+    
+    def __iter_find__(self, path, max_depth=None):
+        if path == None or len(path) == 0:
+            return iter(())
+        if max_depth != None:
+            fe = FinderExpression.compile(path, max_depth=max_depth)
+        else:
+            fe = FinderExpression.compile(path)
+        return fe.iter_evaluate(self)
+    
+    def __find_first__(self, path, max_depth=None):
+        for value in self.__iter_find__(path, max_depth):
+            return value
+        return None
+    
+    async def __afind__(self, path, max_depth=None):
+        return await asyncio.get_running_loop().run_in_executor(None, self.__find__, path, max_depth)
+    
+    def __find_many__(self, paths, max_depth=None):
+        kw = {} if max_depth == None else {'max_depth': max_depth}
+        trie = PathTrie(**kw)
+        results = {}
+        for path in paths:
+            if path == None or len(path) == 0:
+                results[path] = []
+            else:
+                trie.add(path)
+        return trie.evaluate(self, results)
 
-            
-            
-            
\ No newline at end of file
+from .io import JSONReader, iter_load, load, loads, dump, dumps, encoders, register_encoder
+from .storage import MappedList
+from .parallel import ParallelExecutor
+_list_types = (list, MappedList)
@@ -0,0 +1,326 @@
+import codecs
+import json
+import re
+from io import StringIO, TextIOBase
+from json.decoder import scanstring
+from . import EmbeddedManager, EmbeddedIterator, Matcher, DoesNotExist, attribute_schema, trace, _missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WHITESPACE = ' \t\n\r'
+NUMBER = '0123456789.eE+-'
+
+_structure = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+_string_end = re.compile(r'["\\]')
+_scalar_end = re.compile(r'[^0-9A-Za-z+\-.]')
+
+class Record(object):
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+
+class JSONReader(object):
+
+    def __init__(self, fp, chunk_size=65536):
+        self.__fp = fp
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__text = None
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+
+    def _read(self):
+        chunk = self.__fp.read(self.__chunk_size)
+        if self.__text == None:
+            self.__text = not isinstance(chunk, (bytes, bytearray))
+            if not self.__text:
+                self.__bytes = codecs.getincrementaldecoder('utf-8-sig')()
+        if not chunk:
+            self.__eof = True
+            return '' if self.__text else self.__bytes.decode(b'', True)
+        return chunk if self.__text else self.__bytes.decode(chunk)
+
+    def _chunk(self):
+        chunk = ''
+        while not chunk and not self.__eof:
+            chunk = self._read()
+        return chunk
+
+    def _refill(self):
+        if self.__eof:
+            return False
+        if self.__pos > self.__chunk_size:
+            self.__buffer = self.__buffer[self.__pos:]
+            self.__pos = 0
+        self.__buffer = self.__buffer + self._read()
+        return True
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.__buffer, self.__pos)
+
+    def peek(self):
+        while True:
+            while self.__pos < len(self.__buffer) and self.__buffer[self.__pos] in WHITESPACE:
+                self.__pos = self.__pos + 1
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self._refill():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == None or char not in chars:
+            raise self._error('Expecting {chars}'.format(chars=' or '.join(repr(c) for c in chars)))
+        self.__pos = self.__pos + 1
+        return char
+
+    def _scan(self, keep):
+        if self.peek() == None:
+            raise self._error('Expecting value')
+        buffer = self.__buffer
+        start = i = self.__pos
+        parts = []
+        depth = 0
+        string = buffer[i] == '"'
+        scalar = not string and buffer[i] not in '[{'
+        if string:
+            i = i + 1
+        while True:
+            if i < len(buffer):
+                if scalar:
+                    match = _scalar_end.search(buffer, i)
+                    if match != None:
+                        end = match.start()
+                        break
+                elif string:
+                    match = _string_end.search(buffer, i)
+                    if match != None:
+                        i = match.end()
+                        if match.group() == '\\':
+                            i = i + 1
+                        else:
+                            string = False
+                            if depth == 0:
+                                end = i
+                                break
+                        continue
+                else:
+                    i = _structure.match(buffer, i).end()
+                    if i < len(buffer):
+                        char = buffer[i]
+                        i = i + 1
+                        if char == '"':
+                            string = True
+                        elif char in '[{':
+                            depth = depth + 1
+                        else:
+                            depth = depth - 1
+                            if depth == 0:
+                                end = i
+                                break
+                        continue
+            if keep:
+                parts.append(buffer[start:])
+            i = max(0, i - len(buffer))
+            start = 0
+            buffer = self._chunk()
+            if not buffer:
+                if not scalar:
+                    self.__buffer = ''.join(parts)
+                    self.__pos = len(self.__buffer)
+                    raise self._error('Unterminated value')
+                end = 0
+                break
+        self.__buffer = buffer
+        self.__pos = end
+        if keep:
+            parts.append(buffer[start:end])
+            return ''.join(parts)
+
+    def _decode(self, text):
+        value, end = self.__decoder.raw_decode(text)
+        if end != len(text):
+            raise json.JSONDecodeError('Extra data', text, end)
+        return value
+
+    def key(self):
+        if self.peek() != '"':
+            self.expect('"')
+        try:
+            value, end = scanstring(self.__buffer, self.__pos + 1)
+            self.__pos = end
+        except json.JSONDecodeError:
+            value = scanstring(self._scan(True), 1)[0]
+        self.expect(':')
+        return value
+
+    def value(self):
+        self.peek()
+        buffer = self.__buffer
+        try:
+            value, end = self.__decoder.raw_decode(buffer, self.__pos)
+            if end < len(buffer) and (buffer[self.__pos] in '[{"' or buffer[end] not in NUMBER):
+                self.__pos = end
+                return value
+        except json.JSONDecodeError:
+            pass
+        return self._decode(self._scan(True))
+
+    def skip(self):
+        self._scan(False)
+
+    def seek(self, path):
+        for segment in path:
+            self.expect('{')
+            found = self.peek() != '}'
+            while found:
+                if self.key() == segment:
+                    break
+                self.skip()
+                found = self.expect(',}') != '}'
+            if not found:
+                raise DoesNotExist('The path segment: {segment} does not exist in the document'.format(segment=segment))
+
+    def items(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.__pos = self.__pos + 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
+def _split_path(path):
+    if path == None or path == '':
+        return []
+    if isinstance(path, str):
+        return path.split('.')
+    return list(path)
+
+def iter_load(fp, path=None, chunk_size=65536):
+    reader = JSONReader(fp, chunk_size)
+    reader.seek(_split_path(path))
+    return reader.items()
+
+def load(fp, type=None, path=None, filter=None, chunk_size=65536, **kw):
+    tracing = trace.enabled
+    matcher = Matcher(filter) if filter else None
+    data = []
+    rejected = 0
+    for element in iter_load(fp, path, chunk_size):
+        if matcher != None:
+            if not matcher(Record(element) if isinstance(element, dict) else element):
+                rejected = rejected + 1
+                continue
+        if type != None:
+            element = type(**element) if isinstance(element, dict) else type(element)
+        data.append(element)
+    if tracing:
+        trace('Loaded {loaded} items, rejected {rejected}', loaded=len(data), rejected=rejected)
+    return EmbeddedManager(data, type=type, **kw)
+
+def loads(s, type=None, path=None, filter=None, **kw):
+    return load(StringIO(s), type=type, path=path, filter=filter, **kw)
+
+def _attribute_values(obj, names):
+    values = {}
+    for name in names:
+        value = getattr(obj, name, _missing)
+        if value is not _missing:
+            values[name] = value
+    return values
+
+def encode_default(obj):
+    if isinstance(obj, EmbeddedManager):
+        return obj.data()
+    if isinstance(obj, EmbeddedIterator):
+        return obj.copy()
+    if isinstance(obj, (set, frozenset)) or hasattr(type(obj), '__iter__') and hasattr(type(obj), '__len__'):
+        return list(obj)
+    instance = getattr(obj, '__dict__', None)
+    if instance == None and not hasattr(type(obj), '__slots__'):
+        raise TypeError('Object of type {type} is not JSON serializable'.format(type=type(obj).__name__))
+    schema = attribute_schema(type(obj))
+    if instance == None or schema.declared != None or schema.reflect:
+        return _attribute_values(obj, schema.attribute_names(obj))
+    values = _attribute_values(obj, schema.names) if schema.names else {}
+    for name, value in instance.items():
+        if name[0] != '_' and not callable(value):
+            values[name] = value
+    return values
+
+def _writer(fp):
+    if isinstance(fp, TextIOBase):
+        return fp.write
+    return lambda chunk: fp.write(chunk.encode('utf-8'))
+
+
+class JSONEncoderBackend(object):
+    
+    name = 'json'
+    
+    def dumps(self, obj, default, **kw):
+        return json.JSONEncoder(default=default, **kw).encode(obj)
+    
+    def dump(self, obj, fp, default, chunk_size=65536, **kw):
+        write = _writer(fp)
+        pending = []
+        size = 0
+        for chunk in json.JSONEncoder(default=default, **kw).iterencode(obj):
+            pending.append(chunk)
+            size = size + len(chunk)
+            if size >= chunk_size:
+                write(''.join(pending))
+                pending = []
+                size = 0
+        if pending:
+            write(''.join(pending))
+
+
+class ORJSONBackend(object):
+    
+    name = 'orjson'
+    
+    def _encode(self, obj, default, **kw):
+        if kw:
+            raise ValueError('The orjson encoder does not support the options: {options}'.format(options=sorted(kw)))
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    
+    def dumps(self, obj, default, **kw):
+        return self._encode(obj, default, **kw).decode('utf-8')
+    
+    def dump(self, obj, fp, default, chunk_size=65536, **kw):
+        data = self._encode(obj, default, **kw)
+        if isinstance(fp, TextIOBase):
+            data = data.decode('utf-8')
+        for start in range(0, len(data), chunk_size):
+            fp.write(data[start:start + chunk_size])
+
+
+encoders = {'json': JSONEncoderBackend()}
+if orjson != None:
+    encoders['orjson'] = ORJSONBackend()
+
+def register_encoder(name, encoder):
+    encoders[name] = encoder
+
+def _encoder(encoder, kw):
+    if encoder == None:
+        encoder = 'json'
+    if isinstance(encoder, str):
+        if encoder not in encoders:
+            raise ValueError('The encoder: {encoder} is not registered'.format(encoder=encoder))
+        return encoders[encoder]
+    return encoder
+
+def dumps(obj, encoder=None, default=encode_default, **kw):
+    return _encoder(encoder, kw).dumps(obj, default, **kw)
+
+def dump(obj, fp, encoder=None, default=encode_default, chunk_size=65536, **kw):
+    _encoder(encoder, kw).dump(obj, fp, default, chunk_size=chunk_size, **kw)
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from . import Matcher, trace
+
+def _filter_chunk(criteria, chunk):
+    matcher = Matcher(criteria)
+    return [position for position, item in enumerate(chunk) if matcher(item)]
+
+class ParallelExecutor(object):
+
+    KINDS = ('process', 'thread')
+
+    def __init__(self, workers=None, threshold=10000, kind='process', chunks=None):
+        if kind not in self.KINDS:
+            raise ValueError('The executor kind: {kind} must be one of {kinds}'.format(kind=kind, kinds=self.KINDS))
+        self.workers = workers if workers != None else (os.cpu_count() or 1)
+        self.threshold = threshold
+        self.kind = kind
+        self.chunks = chunks if chunks != None else self.workers * 4
+        self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def shutdown(self):
+        if self.__pool != None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def _pool(self):
+        if self.__pool == None:
+            if self.kind == 'process':
+                self.__pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.__pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self.__pool
+
+    def parallel(self, items):
+        return self.workers > 1 and len(items) >= self.threshold
+
+    def partition(self, items):
+        size = max(1, -(-len(items) // self.chunks))
+        return [(start, items[start:start + size]) for start in range(0, len(items), size)]
+
+    def map(self, function, items, *args):
+        tracing = trace.enabled
+        partitions = self.partition(items)
+        if tracing:
+            trace('Running {count} chunks on {workers} {kind} workers', count=len(partitions), workers=self.workers, kind=self.kind)
+        pool = self._pool()
+        futures = [(start, pool.submit(function, *(args + (chunk,)))) for start, chunk in partitions]
+        return [(start, future.result()) for start, future in futures]
+
+    def positions(self, items, criteria):
+        criteria = dict(criteria)
+        return [start + position for start, positions in self.map(_filter_chunk, items, criteria) for position in positions]
+
+    def filter(self, items, criteria):
+        return [items[position] for position in self.positions(items, criteria)]
+
@@ -0,0 +1,133 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from .io import encode_default
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HEADER = struct.Struct('<4sQ')
+LENGTH = struct.Struct('<I')
+MAGIC = b'JMML'
+
+class MappedList(object):
+
+    def __init__(self, path, type=None, default=encode_default):
+        self.__path = path
+        self.__type = type
+        self.__default = default
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as fp:
+                fp.write(HEADER.pack(MAGIC, 0))
+        self.__file = open(path, 'r+b')
+        self.__map = None
+        self.__offsets = array('Q')
+        self.__end = HEADER.size
+        if HEADER.unpack(self.__file.read(HEADER.size))[0] != MAGIC:
+            self.__file.close()
+            raise ValueError('The file: {path} is not a MappedList file'.format(path=path))
+
+    def path(self):
+        return self.__path
+
+    def close(self):
+        if self.__map != None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _count(self):
+        if self.__map == None:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        return HEADER.unpack_from(self.__map, 0)[1]
+
+    def _sync(self, rows):
+        offsets = self.__offsets
+        if rows > len(offsets):
+            if self.__map == None or len(self.__map) < os.fstat(self.__file.fileno()).st_size:
+                if self.__map != None:
+                    self.__map.close()
+                self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            end = self.__end
+            unpack = LENGTH.unpack_from
+            data = self.__map
+            while len(offsets) < rows:
+                offsets.append(end)
+                end = end + LENGTH.size + unpack(data, end)[0]
+            self.__end = end
+
+    def __len__(self):
+        return self._count()
+
+    def _decode(self, row):
+        offset = self.__offsets[row]
+        length = LENGTH.unpack_from(self.__map, offset)[0]
+        start = offset + LENGTH.size
+        value = json.loads(self.__map[start:start + length])
+        if self.__type != None:
+            return self.__type(**value) if isinstance(value, dict) else self.__type(value)
+        return value
+
+    def __getitem__(self, index):
+        count = self._count()
+        if isinstance(index, slice):
+            rows = range(*index.indices(count))
+            if rows:
+                self._sync(max(rows[0], rows[-1]) + 1)
+            return [self._decode(row) for row in rows]
+        if index < 0:
+            index = index + count
+        if index < 0 or index >= count:
+            raise IndexError('Index [{index}] out of range'.format(index=index))
+        self._sync(index + 1)
+        return self._decode(index)
+
+    def __iter__(self):
+        count = self._count()
+        self._sync(count)
+        for row in range(count):
+            yield self._decode(row)
+
+    def __contains__(self, item):
+        for value in self:
+            if value == item:
+                return True
+        return False
+
+    def _encode(self, item):
+        payload = json.dumps(item, default=self.__default, separators=(',', ':')).encode('utf-8')
+        return LENGTH.pack(len(payload)) + payload
+
+    def extend(self, iterable):
+        records = [self._encode(item) for item in iterable]
+        if not records:
+            return
+        if fcntl != None:
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+        try:
+            count = self._count()
+            self._sync(count)
+            self.__file.seek(self.__end)
+            self.__file.write(b''.join(records))
+            self.__file.seek(0)
+            self.__file.write(HEADER.pack(MAGIC, count + len(records)))
+            self.__file.flush()
+        finally:
+            if fcntl != None:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+
+    def append(self, item):
+        self.extend([item])
+
+    def copy(self):
+        return list(self)
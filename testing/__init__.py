@@ -1,3 +1,21 @@
 from .embedded_manager_tests import EmbeddedManagerTests
 from .embedded_manager_tests import ExpressionTests
-from .embedded_manager_tests import FinderTests
\ No newline at end of file
+from .embedded_manager_tests import FinderTests
+from .embedded_manager_tests import IndexedEmbeddedManagerTests
+from .embedded_manager_tests import LazyEmbeddedIteratorTests
+from .embedded_manager_tests import MatcherTests
+from .embedded_manager_tests import TracerTests
+from .embedded_manager_tests import LookupTests
+from .embedded_manager_tests import ColumnarEmbeddedManagerTests
+from .io_tests import LoadTests
+from .io_tests import DumpTests
+from .storage_tests import MappedListTests
+from .embedded_manager_tests import EmbeddedViewTests
+from .parallel_tests import ParallelExecutorTests
+from .benchmark_tests import BenchmarkSuiteTests
+from .embedded_manager_tests import StatsTests
+from .embedded_manager_tests import EmbeddedIteratorRowsTests
+from .embedded_manager_tests import QueryPlannerTests
+from .embedded_manager_tests import ResultCacheTests
+from .embedded_manager_tests import AsyncTests
+from .embedded_manager_tests import StreamingFindTests
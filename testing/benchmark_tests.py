@@ -0,0 +1,38 @@
+from unittest import TestCase
+from benchmarks import suite, bench_tracing
+
+class BenchmarkSuiteTests(TestCase):
+    
+    def test_run_records_results(self):
+        results = suite.run(sizes=[10], repeat=1, min_time=0, pattern='backing=list', memory=False)
+        names = [result['name'] for result in results['results']]
+        self.assertIn('filter[F=True,backing=list,criteria=2,size=10]', names)
+        self.assertIn('get[backing=list,size=10]', names)
+        self.assertFalse([name for name in names if 'backing=list' not in name])
+        for result in results['results']:
+            self.assertTrue(result['min'] > 0)
+            self.assertTrue(result['median'] >= result['min'])
+        
+    def test_tracing_module_strips(self):
+        module = bench_tracing.stripped_module()
+        root = module.Finder()
+        root.children = module.EmbeddedManager([{'id': 1}])
+        self.assertEqual([{'id': 1}], root.__find__('children'))
+        
+    def test_compare_flags_regressions(self):
+        base = {'results': [{'name': 'a', 'min': 1.0}, {'name': 'b', 'min': 1.0}, {'name': 'c', 'min': 1.0}]}
+        current = {'results': [{'name': 'a', 'min': 1.5}, {'name': 'b', 'min': 0.5}, {'name': 'c', 'min': 1.05}, {'name': 'd', 'min': 1.0}]}
+        self.assertEqual([
+            ('a', 1.0, 1.5, 1.5, 'REGRESSION'),
+            ('b', 1.0, 0.5, 0.5, 'improved'),
+            ('c', 1.0, 1.05, 1.05, ''),
+        ], suite.compare(base, current, threshold=0.1))
+        
+    def test_compare_memory(self):
+        base = {'memory': [{'name': 'a', 'bytes': 100}, {'name': 'b', 'bytes': 100}]}
+        current = {'memory': [{'name': 'a', 'bytes': 50}, {'name': 'b', 'bytes': 200}]}
+        self.assertEqual([
+            ('a', 100, 50, 0.5, 'improved'),
+            ('b', 100, 200, 2.0, 'REGRESSION'),
+        ], suite.compare_memory(base, current))
+        self.assertEqual([], suite.compare_memory({}, current))
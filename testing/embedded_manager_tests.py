@@ -1,6 +1,11 @@
-from unittest import TestCase
-from json_model import EmbeddedManager, DoesNotExist, F, Expression, parse_criteria
-from json_model import Finder
+from unittest import TestCase, skipIf
+from json_model import EmbeddedManager, DoesNotExist, F, Expression, parse_criteria, matches, Matcher
+from json_model import Finder, FinderExpression, ExpressionCache, expression_cache, attribute_names
+import json_model
+from json_model import Tracer, Deferred, numpy, EmbeddedView, stats, collect_stats, enable_stats, reset_stats
+import asyncio
+import gc
+import weakref
 import logging
 logger = logging.getLogger(__name__)
 
@@ -56,6 +61,33 @@ class Dummy(object):
     
 class FDummy(Dummy, Finder):
     pass
+
+class Node(Finder):
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+    
+class Slotted(Finder):
+    __slots__ = ('id', 'name', 'link')
+    kind = 'SLOTTED'
+    
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+            
+    @property
+    def label(self):
+        return 'LABEL_{id}'.format(id=self.id)
+    
+    def describe(self):
+        return self.label
+    
+class Declared(Node):
+    __traversable__ = ('link',)
+    
+class Unreachable(object):
+    def __getattr__(self, name):
+        raise AssertionError('The item should not have been evaluated')
             
             
 class ExpressionTests(TestCase):
@@ -103,6 +135,13 @@ class ExpressionTests(TestCase):
         self.assertEqual(1, len(c))
         self.assertEqual(",['", c['name'])
         
+    def test_parse_criteria_syntax_errors(self):
+        for criteria in ['name="value', 'name="value"x', '"value"', 'name=,', ',name=1', 'name=value', '=1']:
+            with self.assertRaises(ValueError):
+                parse_criteria(criteria)
+        self.assertEqual({}, parse_criteria(''))
+        self.assertEqual({'name': 'a,b', 'id': 1}, parse_criteria('name="a,b",id=1'))
+        
     
     def test_none_expression(self):
         with self.assertRaises(ValueError):
@@ -192,6 +231,37 @@ class ExpressionTests(TestCase):
         self.assertIsNone(e_link_id_eq_3.evaluate(obj))
         e_objects_id_eq_4 = Expression('objects[id=4]')
         self.assertEqual(4, e_objects_id_eq_4.evaluate(obj).id)
+        
+    def test_compiled_expressions_are_cached(self):
+        e1 = FinderExpression.compile('link[id=2].name')
+        hits = expression_cache.hits
+        e2 = FinderExpression.compile('link[id=2].name')
+        self.assertIs(e1, e2)
+        self.assertEqual(hits + 1, expression_cache.hits)
+        self.assertIsNot(e1, Expression.compile('link[id=2].name'))
+        self.assertIsInstance(Expression.compile('link[id=2].name'), Expression)
+        
+    def test_compiled_expressions_are_immutable(self):
+        e = FinderExpression.compile('link[id=2].name')
+        with self.assertRaises(AttributeError):
+            e.name = 'other'
+        with self.assertRaises(AttributeError):
+            e.next.name = 'other'
+        with self.assertRaises(TypeError):
+            e.criteria['id'] = 3
+        
+    def test_expression_cache_evicts_least_recently_used(self):
+        cache = ExpressionCache(maxsize=2)
+        a = cache.get(Expression, 'a')
+        b = cache.get(Expression, 'b')
+        self.assertIs(a, cache.get(Expression, 'a'))
+        cache.get(Expression, 'c')
+        self.assertEqual(2, len(cache))
+        self.assertIs(a, cache.get(Expression, 'a'))
+        self.assertIsNot(b, cache.get(Expression, 'b'))
+        self.assertEqual({'hits': 2, 'misses': 4, 'size': 2, 'maxsize': 2}, cache.info())
+        cache.clear()
+        self.assertEqual(0, len(cache))
 
     def test_evaluate_with_criteria_1(self): 
         obj = Dummy(id=1, 
@@ -226,6 +296,19 @@ class EmbeddedManagerTests(TestCase):
             self.assertEqual(data[i], item)
             i = i + 1
         
+    def test_all_iterates_dict_keys(self):
+        data = {'key{i}'.format(i=i): Dummy(id=i) for i in range(1000)}
+        lm = EmbeddedManager(data)
+        self.assertEqual(list(data), [key for key in lm.all()])
+        self.assertEqual(['key3'], [key for key in lm.filter(id=3)])
+        
+    def test_all_detects_dict_changed_during_iteration(self):
+        data = {'key1': 'a', 'key2': 'b', 'key3': 'c'}
+        lm = EmbeddedManager(data)
+        with self.assertRaises(RuntimeError):
+            for key in lm.all():
+                lm.update({key + '_copy': 'x'})
+        
     def test_all_is_indexable(self):
         data = ['a', 'b', 'c']
         lm = EmbeddedManager(data)
@@ -810,6 +893,279 @@ class EmbeddedManagerTests(TestCase):
         self.assertEqual(0, len(lm))
         
         
+class LookupTests(TestCase):
+    
+    def data(self):
+        return [
+            Dummy(id=1, price=5, cost=4, kind='X'),
+            Dummy(id=2, price=10, cost=12, kind='Y'),
+            Dummy(id=3, price=15, cost=15, kind='X'),
+            Dummy(id=4, price=None, cost=1, kind='Y'),
+            Dummy(id=5, price=20, cost=30, kind='X'),
+            Dummy(id=6, cost=0, kind='Z')
+        ]
+    
+    def test_parse_comparison_criteria(self):
+        self.assertEqual({'price__gt': 10}, parse_criteria('price>10'))
+        self.assertEqual({'price__gte': 10, 'price__lt': 20.5}, parse_criteria('price>=10,price<20.5'))
+        self.assertEqual({'price__lte': 1, 'name__ne': 'a>b'}, parse_criteria('price<=1,name!="a>b"'))
+        for criteria in ['price>', '>1', 'price>=,id=1', 'price<>1']:
+            with self.assertRaises(ValueError):
+                parse_criteria(criteria)
+        self.assertEqual({'price__gt': 10}, Expression('items[price>10]').criteria)
+        
+    def test_filter_with_lookups(self):
+        lm = EmbeddedManager(self.data())
+        self.assertEqual([3, 5], [item.id for item in lm.filter(price__gt=10)])
+        self.assertEqual([2, 3, 5], [item.id for item in lm.filter(price__gte=10)])
+        self.assertEqual([1], [item.id for item in lm.filter(price__lt=10)])
+        self.assertEqual([1, 2], [item.id for item in lm.filter(price__lte=10)])
+        self.assertEqual([2, 3], [item.id for item in lm.filter(price__range=(10, 15))])
+        self.assertEqual([1, 3, 5, 6], [item.id for item in lm.filter(kind__in=['X', 'Z'])])
+        self.assertEqual([2, 4, 6], [item.id for item in lm.filter(kind__ne='X')])
+        self.assertEqual([1, 3], [item.id for item in lm.filter(price__gte=F('cost'), kind='X')])
+        self.assertEqual(3, lm.get(price__gt=10, kind__exact='X').id)
+        for criteria in [{'price__gt': 10}, {'price__gte': F('cost')}, {'kind__in': ['Y']}]:
+            for item in self.data():
+                self.assertEqual(matches(item, **criteria), Matcher(criteria)(item))
+        
+    def test_find_with_comparison(self):
+        test = FDummy(id=0, embedded=EmbeddedManager(self.data()))
+        self.assertEqual([3, 5], test.__find__('embedded[price>10].id'))
+        self.assertEqual([3, 5], test.__find__('embedded[price>10,kind="X"].id'))
+        self.assertEqual([2, 4, 6], test.__find__('embedded[kind!="X"].id'))
+        
+    def test_sorted_index(self):
+        lm = EmbeddedManager(self.data(), type=Dummy, sorted_indexes=['price'])
+        self.assertEqual(['price'], lm.sorted_indexes())
+        plain = EmbeddedManager(self.data())
+        for criteria in [
+                {'price__gt': 10},
+                {'price__gte': 10, 'price__lt': 20},
+                {'price__range': (5, 15), 'kind': 'X'},
+                {'price': 15},
+                {'price__lte': 4},
+                {'price__gt': 'text'},
+                {'price__gt': F('cost')}
+            ]:
+            self.assertEqual(
+                [item.id for item in plain.filter(**criteria)],
+                [item.id for item in lm.filter(**criteria)])
+        lm.append(Dummy(id=7, price=12))
+        lm.extend([Dummy(id=8, price=10), Dummy(id=9, price=1)])
+        self.assertEqual([2, 3, 7, 8], [item.id for item in lm.filter(price__range=(10, 15))])
+        self.assertEqual(9, lm.get(price__lt=5).id)
+        
+    def test_sorted_index_with_dict(self):
+        data = {'key{id}'.format(id=item.id): item for item in self.data()}
+        lm = EmbeddedManager(data, type=Dummy, sorted_indexes=['price'])
+        self.assertEqual(['key3', 'key5'], list(lm.filter(price__gt=10).keys()))
+        lm.update({'key1': Dummy(id=7, price=25), 'key7': Dummy(id=8, price=11)})
+        self.assertEqual(['key1', 'key3', 'key5', 'key7'], list(lm.filter(price__gt=10).keys()))
+        
+    def test_sorted_index_with_mixed_types(self):
+        lm = EmbeddedManager([Dummy(id=1, price=1), Dummy(id=2, price='2')], sorted_indexes=['price'])
+        self.assertEqual([1], [item.id for item in lm.filter(price__lt=2)])
+        
+        
+class LazyEmbeddedIteratorTests(TestCase):
+    
+    def test_filter_streams_until_first_match(self):
+        data = [
+            Dummy(id=1, name='NAME_A', kind='X'),
+            Dummy(id=2, name='NAME_B', kind='X'),
+            Unreachable()
+        ]
+        lm = EmbeddedManager(data)
+        filtered = lm.filter(kind='X')
+        self.assertEqual(2, filtered.get(name='NAME_B').id)
+        self.assertEqual(1, filtered.first().id)
+        self.assertTrue(filtered.exists())
+        self.assertEqual(2, filtered[1].id)
+        self.assertTrue(Dummy(id=2, name='NAME_B', kind='X') in filtered)
+        for item in filtered:
+            break
+        self.assertFalse(filtered.is_materialised())
+        with self.assertRaises(AssertionError):
+            len(filtered)
+        self.assertFalse(filtered.is_materialised())
+    
+    def test_filter_streams_dict_keys(self):
+        data = {
+            'key1': Dummy(id=1, name='NAME_A', kind='X'),
+            'key2': Unreachable(),
+            'key3': Dummy(id=3, name='NAME_B', kind='Y')
+        }
+        lm = EmbeddedManager(data)
+        filtered = lm.filter(kind='X')
+        self.assertEqual(1, filtered.get('key1').id)
+        self.assertEqual(1, filtered['key1'].id)
+        self.assertTrue('key1' in filtered)
+        self.assertEqual(1, filtered.first().id)
+        with self.assertRaises(KeyError):
+            lm.filter(kind='X')['key3']
+        with self.assertRaises(DoesNotExist):
+            lm.filter(kind='X').get('key3')
+        self.assertFalse(filtered.is_materialised())
+        
+    def test_empty_filter(self):
+        lm = EmbeddedManager([Dummy(id=1, kind='X')])
+        self.assertIsNone(lm.filter(kind='Y').first())
+        self.assertFalse(lm.filter(kind='Y').exists())
+        with self.assertRaises(IndexError):
+            lm.filter(kind='Y')[0]
+    
+    def test_get_applies_filter_and_keys(self):
+        data = [
+            Dummy(id=1, name='NAME_A'),
+            Dummy(id=2, name='NAME_B')
+        ]
+        lm = EmbeddedManager(data)
+        filtered = lm.filter(name='NAME_A')
+        with self.assertRaises(DoesNotExist):
+            filtered.get(name='NAME_B')
+        self.assertEqual(1, len(filtered))
+        self.assertTrue(filtered.is_materialised())
+        with self.assertRaises(DoesNotExist):
+            filtered.get(name='NAME_B')
+        self.assertEqual(1, filtered.get(id=1).id)
+        
+        
+class MatcherTests(TestCase):
+    
+    def test_matcher_agrees_with_matches(self):
+        items = [
+            Dummy(id=1, name='NAME_A', check='NAME_A', flag=True),
+            Dummy(id=2, name='NAME_A', check='NAME_B', flag=True),
+            Dummy(id=3, name='NAME_B', check='NAME_B', flag=False),
+            Dummy(id=4, name='NAME_B', check=None),
+            Dummy(id=5, check=None)
+        ]
+        for criteria in [
+                {},
+                {'name': 'NAME_A'},
+                {'name': 'NAME_B', 'flag': False},
+                {'flag': True, 'id': 2, 'name': 'NAME_A'},
+                {'name': F('check')},
+                {'name': F('check'), 'flag': True},
+                {'missing': None}
+            ]:
+            matcher = Matcher(criteria)
+            for item in items:
+                self.assertEqual(matches(item, **criteria), matcher(item))
+    
+    def test_matcher_orders_checks(self):
+        matcher = Matcher({'ref': F('check'), 'flag': True, 'name': 'NAME_A'})
+        self.assertEqual(('name', 'flag', 'ref'), matcher.names)
+        matcher = Matcher({'kind': 'X', 'name': 'NAME_A'}, selectivity={'kind': 0.5, 'name': 0.01})
+        self.assertEqual(('name', 'kind'), matcher.names)
+        
+    def test_matcher_with_tuple_value(self):
+        matcher = Matcher({'pair': (1, 2)})
+        self.assertTrue(matcher(Dummy(pair=(1, 2))))
+        self.assertFalse(matcher(Dummy(pair=(1, 3))))
+        
+        
+class TracerTests(TestCase):
+    
+    def test_arguments_are_not_evaluated_when_disabled(self):
+        calls = []
+        tracer = Tracer(logging.getLogger('testing.tracer.disabled'))
+        tracer.logger.setLevel(logging.INFO)
+        self.assertFalse(tracer.enabled)
+        tracer('Values: {values}', values=Deferred(lambda: calls.append('called')))
+        self.assertEqual([], calls)
+        
+    def test_arguments_are_evaluated_when_enabled(self):
+        tracer = Tracer(logging.getLogger('testing.tracer.enabled'))
+        with self.assertLogs('testing.tracer.enabled', level='DEBUG') as logs:
+            self.assertTrue(tracer.enabled)
+            tracer('Values: {values}, name: {name}', values=Deferred(lambda: [1, 2]), name='NAME')
+        self.assertEqual(['DEBUG:testing.tracer.enabled:Values: [1, 2], name: NAME'], logs.output)
+        
+    def test_only_deferred_arguments_are_called(self):
+        tracer = Tracer(logging.getLogger('testing.tracer.plain'))
+        with self.assertLogs('testing.tracer.plain', level='DEBUG') as logs:
+            tracer('Function: {function}', function=len)
+            tracer('Function: {function.__name__}', function=attribute_names)
+        self.assertEqual([
+            'DEBUG:testing.tracer.plain:Function: {len}'.format(len=len),
+            'DEBUG:testing.tracer.plain:Function: attribute_names'
+        ], logs.output)
+        
+    def test_find_traces_when_enabled(self):
+        test = FDummy(id=1, name='NAME_1', embedded=EmbeddedManager([FDummy(id=2, name='NAME_2')]))
+        with self.assertLogs('json_model', level='DEBUG') as logs:
+            self.assertEqual(['NAME_2'], test.__find__('**.name'))
+            self.assertEqual(['NAME_2'], test.__find__('**[id=2].name'))
+        self.assertTrue(any('Evaluating open search' in line for line in logs.output))
+        self.assertTrue(any('Length filtered list: 1' in line for line in logs.output))
+        
+        
+class IndexedEmbeddedManagerTests(TestCase):
+    
+    def test_indexes_are_declared(self):
+        lm = EmbeddedManager([], type=Dummy, indexes=['name', ('kind', 'owner')])
+        self.assertEqual([('name',), ('kind', 'owner')], lm.indexes())
+        with self.assertRaises(ValueError):
+            EmbeddedManager([], indexes=[()])
+    
+    def test_get_and_filter_with_index(self):
+        data = [
+            Dummy(id=1, name='NAME_A', kind='X', owner='O1'),
+            Dummy(id=2, name='NAME_A', kind='Y', owner='O1'),
+            Dummy(id=3, name='NAME_B', kind='X', owner='O2'),
+            Dummy(id=4, name='NAME_B', kind='X', owner='O1'),
+            Dummy(id=5)
+        ]
+        lm = EmbeddedManager(data, type=Dummy, indexes=['name', ('kind', 'owner')])
+        self.assertEqual(3, lm.get(name='NAME_B').id)
+        self.assertEqual(4, lm.get(name='NAME_B', owner='O1').id)
+        self.assertEqual([1, 4], [item.id for item in lm.filter(kind='X', owner='O1')])
+        self.assertEqual([4], [item.id for item in lm.filter(kind='X', owner='O1', name='NAME_B')])
+        self.assertEqual(0, len(lm.filter(name='NAME_C')))
+        with self.assertRaises(DoesNotExist):
+            lm.get(name='NAME_A', kind='Z')
+        self.assertEqual(4, lm.filter(name='NAME_B').get(owner='O1').id)
+    
+    def test_index_with_dict(self):
+        data = {
+            'key1': Dummy(id=1, name='NAME_A'),
+            'key2': Dummy(id=2, name='NAME_B'),
+            'key3': Dummy(id=3, name='NAME_A')
+        }
+        lm = EmbeddedManager(data, type=Dummy, indexes=['name'])
+        self.assertEqual(['key1', 'key3'], list(lm.filter(name='NAME_A').keys()))
+        lm.update({'key1': Dummy(id=4, name='NAME_B'), 'key4': Dummy(id=5, name='NAME_A')})
+        self.assertEqual(['key3', 'key4'], list(lm.filter(name='NAME_A').keys()))
+        self.assertEqual(['key1', 'key2'], list(lm.filter(name='NAME_B').keys()))
+        lm.create('key5', id=6, name='NAME_B')
+        self.assertEqual(['key1', 'key2', 'key5'], list(lm.filter(name='NAME_B').keys()))
+    
+    def test_index_is_maintained_by_mutators(self):
+        lm = EmbeddedManager(type=Dummy, indexes=['name'])
+        lm.append(Dummy(id=1, name='NAME_A'))
+        lm.extend(Dummy(id=i, name='NAME_B') for i in [2, 3])
+        lm.create(id=4, name='NAME_A')
+        self.assertEqual([1, 4], [item.id for item in lm.filter(name='NAME_A')])
+        self.assertEqual([2, 3], [item.id for item in lm.filter(name='NAME_B')])
+        lm.set([Dummy(id=5, name='NAME_B')])
+        self.assertEqual(0, len(lm.filter(name='NAME_A')))
+        self.assertEqual(5, lm.get(name='NAME_B').id)
+        lm.clear()
+        with self.assertRaises(DoesNotExist):
+            lm.get(name='NAME_B')
+    
+    def test_index_falls_back_to_scan(self):
+        data = [
+            Dummy(id=1, name='NAME_A', tags=['a']),
+            Dummy(id=2, name='NAME_A', tags=['b'])
+        ]
+        lm = EmbeddedManager(data, type=Dummy, indexes=['tags', 'name'])
+        self.assertEqual(2, lm.get(tags=['b']).id)
+        self.assertEqual(2, lm.get(name=F('name'), id=2).id)
+        
+        
 class FinderTests(TestCase):
     
     def test_mixin_adds_find_method(self):
@@ -996,6 +1352,665 @@ class FinderTests(TestCase):
         self.assertEqual(1, len(result))
         self.assertTrue(FDummy(id=3, name='NAME_2_3', check='F') in result)
         
+    def test_open_search_with_cycles(self):
+        child = Node(id=2, name='NAME_2')
+        test = Node(id=1, name='NAME_1', link=child)
+        child.parent = test
+        child.siblings = EmbeddedManager([child])
+        result = test.__find__('**.name')
+        self.assertEqual(['NAME_2'], result)
+        
+    def test_open_search_visits_shared_children_once(self):
+        shared = FDummy(id=3, name='NAME_3')
+        test = FDummy(
+            id=1,
+            name='NAME_1',
+            first=FDummy(id=2, name='NAME_2', child=shared),
+            second=FDummy(id=4, name='NAME_4', child=shared),
+            embedded=[shared, shared])
+        result = test.__find__('**.name')
+        self.assertEqual(3, len(result))
+        self.assertEqual(1, result.count('NAME_3'))
+
+    def test_open_search_visits_shared_children_once_across_parents(self):
+        shared = FDummy(id=3, child=FDummy(id=4, name='shared'))
+        test = FDummy(
+            id=1,
+            groups=[FDummy(id=2, link=shared), FDummy(id=5, link=shared)])
+        self.assertEqual(['shared'], test.__find__('groups.link.**.name'))
+        self.assertEqual(['shared'], list(test.__iter_find__('groups.link.**.name')))
+        self.assertEqual(['shared'], test.__find__('groups.link.**.name', max_depth=2))
+
+    def test_open_search_max_depth(self):
+        test = FDummy(
+            id=1,
+            name='NAME_1',
+            link=FDummy(id=2, name='NAME_2', link=FDummy(id=3, name='NAME_3', link=FDummy(id=4, name='NAME_4'))))
+        self.assertEqual(['NAME_4', 'NAME_3', 'NAME_2'], test.__find__('**.name'))
+        self.assertEqual(['NAME_2'], test.__find__('**.name', max_depth=1))
+        self.assertEqual(['NAME_3', 'NAME_2'], test.__find__('**.name', max_depth=2))
+        shared = FDummy(id=5, inner=FDummy(id=6, target='T'))
+        test = FDummy(id=0, a=FDummy(id=1, b=FDummy(id=2, c=FDummy(id=3, d=shared))), z=shared)
+        for max_depth in range(2, 7):
+            self.assertEqual(['T'], test.__find__('**.target', max_depth=max_depth), max_depth)
+        self.assertEqual([], test.__find__('**.target', max_depth=1))
+        self.assertEqual(['T'], test.__find__('**.target'))
+        
+    def test_attribute_names(self):
+        self.assertEqual(['id', 'link', 'name'], list(attribute_names(Dummy(id=1, name='NAME', link=None, _hidden=1))))
+        self.assertEqual(('id', 'kind', 'label', 'link', 'name'), attribute_names(Slotted(id=1)))
+        self.assertEqual(('link',), attribute_names(Declared(id=1, link=None)))
+        self.assertEqual(['name'], list(attribute_names(Node(name='NAME', action=len))))
+        
+    def test_find_with_attribute_schemas(self):
+        test = Slotted(id=1, name='NAME_1', link=Declared(id=2, name='NAME_2', link=Slotted(id=3, name='NAME_3')))
+        self.assertEqual(['LABEL_3'], test.__find__('**.label'))
+        self.assertEqual(['NAME_3'], test.__find__('**.name'))
+        self.assertEqual([1, 'SLOTTED', 'LABEL_1'], test.__find__('*')[:3])
+        
+    def test_find_many_matches_find(self):
+        test = FDummy(
+            id=1,
+            name='NAME_1',
+            link=FDummy(id=5, name='NAME_5'),
+            embedded=EmbeddedManager([
+                FDummy(id=2, name='NAME_2', sub=EmbeddedManager([FDummy(id=1, name='NAME_1_1', check='A')])),
+                FDummy(id=3, name='NAME_3', sub=EmbeddedManager([FDummy(id=3, name='NAME_2_3', check='F')]))
+            ]))
+        paths = [
+            'name',
+            'link.name',
+            'embedded.name',
+            'embedded[id=3].name',
+            'embedded[id=3].sub.check',
+            'embedded[0].sub.name',
+            'embedded.sub[id=3].name',
+            'embedded[id=9].sub.name',
+            '*.name',
+            '**.name',
+            '**[id=3].name',
+            'embedded.**.check',
+            'missing.name',
+            ''
+        ]
+        results = test.__find_many__(paths)
+        self.assertEqual(set(paths), set(results))
+        for path in paths:
+            self.assertEqual(test.__find__(path), results[path])
+        with self.assertRaises(ValueError):
+            test.__find_many__(['name', '**'])
+            
+    def test_find_many_walks_shared_prefix_once(self):
+        
+        class Counting(Node):
+            reads = 0
+            
+            @property
+            def orders(self):
+                Counting.reads = Counting.reads + 1
+                return self._orders
+            
+        test = Counting(_orders=[
+            Node(id=1, status='open', code='A', lines=[Node(sku='X')]),
+            Node(id=2, status='closed', code='B', lines=[]),
+            Node(id=3, status='open', code='C', lines=[Node(sku='Y'), Node(sku='Z')])
+        ])
+        results = test.__find_many__([
+            'orders[status="open"].code',
+            'orders[status="open"].id',
+            'orders[status="open"].lines.sku'
+        ])
+        self.assertEqual(1, Counting.reads)
+        self.assertEqual(['A', 'C'], results['orders[status="open"].code'])
+        self.assertEqual([1, 3], results['orders[status="open"].id'])
+        self.assertEqual(['X', 'Y', 'Z'], results['orders[status="open"].lines.sku'])
+
+    def test_find_many_matches_find_with_shared_nodes(self):
+        shared = FDummy(id=3, name='NAME_3', child=FDummy(id=4, name='NAME_4', sub=[FDummy(id=7, name='NAME_7')]))
+        test = FDummy(
+            id=1,
+            groups=[
+                FDummy(id=2, link=shared),
+                FDummy(id=5, link=FDummy(id=6, name='NAME_6', child=shared)),
+                FDummy(id=8, link=shared)
+            ])
+        paths = [
+            'groups.link.name',
+            'groups.link.**.name',
+            'groups.link.**.sub.name',
+            'groups.link.child.**.name',
+            'groups.**.name',
+            'groups.*.**.name',
+            '**.child.name'
+        ]
+        for max_depth in [None, 1, 2, 3]:
+            results = test.__find_many__(paths, max_depth=max_depth)
+            for path in paths:
+                self.assertEqual(test.__find__(path, max_depth=max_depth), results[path], (path, max_depth))
+        self.assertEqual(['NAME_4', 'NAME_7'], test.__find_many__(paths)['groups.link.**.name'])
+
+@skipIf(numpy == None, 'numpy is not installed')
+class ColumnarEmbeddedManagerTests(TestCase):
+    
+    def data(self):
+        return [Dummy(id=i, name='NAME_{i}'.format(i=i % 3), score=i * 1.5, active=i % 2 == 0) for i in range(10)]
+    
+    def test_columns_are_inferred(self):
+        lm = EmbeddedManager(self.data(), type=Dummy, columns=True)
+        self.assertEqual(('active', 'id', 'name', 'score'), lm.columns())
+        lm = EmbeddedManager(self.data(), type=Dummy, columns=['id', 'name'])
+        self.assertEqual(('id', 'name'), lm.columns())
+        
+    def test_filter_and_get_match_unindexed(self):
+        data = self.data()
+        plain = EmbeddedManager(data, type=Dummy)
+        lm = EmbeddedManager(data, type=Dummy, columns=True)
+        for criteria in [
+            {'name': 'NAME_1'},
+            {'id__gte': 3, 'id__lt': 8},
+            {'score__range': (3, 9), 'active': True},
+            {'name__in': ['NAME_0', 'NAME_2'], 'id__ne': 6},
+            {'name': 'NAME_1', 'id__gt': 'X'},
+            {'id': F('id'), 'name': 'NAME_2'},
+        ]:
+            self.assertEqual([item.id for item in plain.filter(**criteria)], [item.id for item in lm.filter(**criteria)])
+            self.assertEqual(len(plain.filter(**criteria)), len(lm.filter(**criteria)))
+        self.assertEqual(4, lm.get(name='NAME_1', id__gt=1).id)
+        with self.assertRaises(DoesNotExist):
+            lm.get(name='NAME_3')
+            
+    def test_columns_stay_in_sync(self):
+        lm = EmbeddedManager(self.data(), type=Dummy, columns=True)
+        self.assertEqual(0, len(lm.filter(name='NAME_X')))
+        lm.append(Dummy(id=10, name='NAME_X', score=1.0, active=True))
+        lm.extend(Dummy(id=i, name='NAME_X', score=2.0, active=False) for i in range(11, 13))
+        self.assertEqual([10, 11, 12], [item.id for item in lm.filter(name='NAME_X')])
+        self.assertEqual([11, 12], [item.id for item in lm.filter(name='NAME_X', active=False)])
+        lm.set([Dummy(id=1, name='NAME_Y', score=0.5, active=True)])
+        self.assertEqual([1], [item.id for item in lm.filter(name='NAME_Y')])
+        
+    def test_mixed_column_is_dropped(self):
+        lm = EmbeddedManager(self.data(), type=Dummy, columns=True)
+        lm.append(Dummy(id=10, name=None, score='high', active=True))
+        self.assertEqual(('active', 'id'), lm.columns())
+        self.assertEqual([10], [item.id for item in lm.filter(score='high')])
+        
+    def test_never_disagrees_with_matcher(self):
+        data = [
+            Dummy(id=2 ** 53, big=2 ** 53, text='a', mixed=1),
+            Dummy(id=2 ** 53 + 1, big=2 ** 53 + 1, text='a\x00', mixed=1),
+            Dummy(id=10 ** 17, big=10 ** 17, text='b', mixed=1.0),
+            Dummy(id=3, big=2 ** 64, text='c', mixed=2),
+        ]
+        plain = EmbeddedManager(data, type=Dummy)
+        lm = EmbeddedManager(data, type=Dummy, columns=True)
+        self.assertEqual(('id',), lm.columns())
+        for criteria in [
+            {'id': 2 ** 53},
+            {'id': 10 ** 17 + 0.0},
+            {'id__gt': 2 ** 53 + 0.0},
+            {'id__in': [3, 2.0 ** 53]},
+            {'id': 2 ** 70},
+            {'id': True},
+            {'text': 'a'},
+            {'text__gt': 'a'},
+            {'big': 2 ** 64},
+            {'mixed': 1},
+        ]:
+            self.assertEqual([item.id for item in plain.filter(**criteria)], [item.id for item in lm.filter(**criteria)], criteria)
+        
+    def test_cheap_index_skips_column_scan(self):
+        data = [Dummy(id=i, name='NAME_{i}'.format(i=i % 3), active=i % 2 == 0) for i in range(1000)]
+        lm = EmbeddedManager(data, type=Dummy, indexes=['id'], columns=True)
+        columns = lm._EmbeddedManager__indexes[-1]
+        planned = []
+        plan = columns.plan
+        columns.plan = lambda criteria: planned.append(criteria) or plan(criteria)
+        self.assertEqual(1, len(lm.filter(id=3, name='NAME_0')))
+        self.assertEqual([], planned)
+        self.assertEqual(167, len(lm.filter(name='NAME_0', active=True)))
+        self.assertEqual(1, len(planned))
+        
+    def test_dict_data_falls_back(self):
+        data = {str(item.id): item for item in self.data()}
+        lm = EmbeddedManager(data, type=Dummy, columns=True)
+        self.assertEqual(['1', '4', '7'], list(lm.filter(name='NAME_1').keys()))
+
+
+class EmbeddedViewTests(TestCase):
+    
+    def test_list_view_tracks_appends(self):
+        lm = EmbeddedManager([Dummy(id=1, active=True), Dummy(id=2, active=False)], type=Dummy)
+        view = lm.view(active=True)
+        self.assertIsInstance(view, EmbeddedView)
+        self.assertEqual([1], [item.id for item in view])
+        lm.append(Dummy(id=3, active=True))
+        lm.extend(Dummy(id=i, active=i % 2 == 0) for i in range(4, 8))
+        lm.create(id=8, active=True)
+        self.assertEqual([1, 3, 4, 6, 8], [item.id for item in view])
+        self.assertEqual(5, len(view))
+        self.assertEqual(6, view.get(id=6).id)
+        self.assertEqual([6, 8], [item.id for item in view.filter(id__gt=4)])
+        self.assertEqual({'active': True}, view.criteria())
+        
+    def test_dict_view_tracks_updates(self):
+        lm = EmbeddedManager({'a': Dummy(id=1, active=True), 'b': Dummy(id=2, active=False)}, type=Dummy)
+        view = lm.view(active=True)
+        self.assertEqual(['a'], list(view.keys()))
+        lm.update({'b': Dummy(id=2, active=True), 'a': Dummy(id=1, active=False)})
+        self.assertEqual(['b'], list(view.keys()))
+        lm.create('c', id=3, active=True)
+        self.assertEqual(['b', 'c'], list(view.keys()))
+        self.assertEqual(2, len(view))
+
+    def test_dict_view_keeps_manager_order(self):
+        lm = EmbeddedManager({key: Dummy(id=i, active=i == 1) for i, key in enumerate('abcd')}, type=Dummy)
+        view = lm.view(active=True)
+        self.assertEqual(['b'], list(view.keys()))
+        lm.update({'e': Dummy(id=4, active=True), 'c': Dummy(id=2, active=True), 'a': Dummy(id=0, active=True)})
+        self.assertEqual(['a', 'b', 'c', 'e'], list(view.keys()))
+        self.assertEqual(list(lm.filter(active=True).keys()), list(view.keys()))
+        self.assertEqual([0, 1, 2, 4], [item.id for item in view.values()])
+        lm.update({'b': Dummy(id=1, active=False), 'd': Dummy(id=3, active=True)})
+        self.assertEqual(list(lm.filter(active=True).keys()), list(view.keys()))
+        self.assertEqual(['a', 'c', 'd', 'e'], list(view.keys()))
+        
+    def test_items_are_tested_once(self):
+        checked = []
+        class Counted(Dummy):
+            @property
+            def active(self):
+                checked.append(self.id)
+                return self.id % 2 == 0
+        lm = EmbeddedManager([Counted(id=i) for i in range(4)], type=Counted)
+        views = [lm.view(active=True) for _ in range(3)]
+        del checked[:]
+        lm.append(Counted(id=4))
+        self.assertEqual([4, 4, 4], checked)
+        self.assertEqual([[0, 2, 4]] * 3, [[item.id for item in view] for view in views])
+        
+    def test_reset_and_refresh(self):
+        lm = EmbeddedManager([Dummy(id=1, active=True)], type=Dummy)
+        view = lm.view(active=True)
+        lm.set([Dummy(id=2, active=True), Dummy(id=3, active=False)])
+        self.assertEqual([2], [item.id for item in view])
+        lm.get(id=3).active = True
+        self.assertEqual([2], [item.id for item in view])
+        view.refresh()
+        self.assertEqual([2, 3], [item.id for item in view])
+        lm.clear()
+        self.assertEqual(0, len(view))
+        
+    def test_views_are_released(self):
+        lm = EmbeddedManager([Dummy(id=1, active=True)], type=Dummy)
+        ref = weakref.ref(lm.view(active=True))
+        gc.collect()
+        self.assertEqual(None, ref())
+        lm.append(Dummy(id=2, active=True))
+
+
+class Reflective(Node):
+    def __dir__(self):
+        return ['id', 'children']
+
+
+class StatsTests(TestCase):
+    
+    def data(self):
+        return [Node(id=i, kind='K{k}'.format(k=i % 3)) for i in range(30)]
+    
+    def test_disabled_by_default(self):
+        reset_stats()
+        EmbeddedManager(self.data()).filter(kind='K1').copy()
+        self.assertEqual(['parse_cache.hits', 'parse_cache.misses'], sorted(stats()))
+    
+    def test_filter_and_get_counters(self):
+        lm = EmbeddedManager(self.data())
+        indexed = EmbeddedManager(self.data(), indexes=['kind'])
+        with collect_stats() as collected:
+            self.assertEqual(10, len(lm.filter(kind='K1')))
+            self.assertEqual(10, len(lm.filter(kind='K1')))
+            self.assertEqual(7, lm.get(id=7).id)
+            self.assertEqual(10, len(indexed.filter(kind='K2')))
+            self.assertEqual(0, lm.all().filter(kind='K0').first().id)
+        self.assertEqual(3, collected['manager.filter'])
+        self.assertEqual(2, collected['manager.filter.unindexed'])
+        self.assertEqual(1, collected['manager.filter.indexed'])
+        self.assertEqual(1, collected['manager.get.unindexed'])
+        self.assertEqual(2, collected['iterator.materialised'])
+        self.assertEqual(30 + 30 + 8 + 1, collected['items.scanned'])
+        self.assertTrue(collected['iterator.materialise.seconds'] > 0)
+        
+    def test_find_counters(self):
+        root = Node(id=0, children=EmbeddedManager([Reflective(id=i, children=[Node(id=10 + i)]) for i in range(3)]))
+        with collect_stats() as collected:
+            self.assertEqual(6, len(root.__find__('**.id')))
+            root.__find__('children[id=1].id')
+            root.__find__('children[id=1].id')
+        self.assertEqual(3, collected['find.calls'])
+        self.assertEqual(2, collected['find[children[id=1].id].calls'])
+        self.assertEqual(2, collected['find[children[id=1].id].results'])
+        self.assertEqual(6, collected['find[children[id=1].id].scanned'])
+        self.assertTrue(collected['find.open_search.nodes'] >= 4)
+        self.assertTrue(collected['schema.reflections'] >= 3)
+        self.assertTrue(collected['parse_cache.hits'] >= 1)
+    
+    def test_nested_and_global(self):
+        lm = EmbeddedManager(self.data())
+        reset_stats()
+        enable_stats()
+        try:
+            lm.get(id=2)
+            with collect_stats() as collected:
+                lm.get(id=4)
+            lm.get(id=1)
+            self.assertEqual(5, collected['items.scanned'])
+            self.assertEqual(3 + 5 + 2, stats()['items.scanned'])
+        finally:
+            enable_stats(False)
+            reset_stats()
+        lm.get(id=1)
+        self.assertNotIn('items.scanned', stats())
+
+
+class EmbeddedIteratorRowsTests(TestCase):
+    
+    def test_filter_holds_positions(self):
+        data = [Dummy(id=i, kind='K{k}'.format(k=i % 3), rank=i % 4) for i in range(12)]
+        filtered = EmbeddedManager(data).filter(kind='K1')
+        self.assertEqual('I', filtered.rows().typecode)
+        self.assertEqual([1, 4, 7, 10], list(filtered.rows()))
+        self.assertIs(data[4], filtered[1])
+        narrowed = filtered.filter(rank=3)
+        self.assertEqual([7], list(narrowed.rows()))
+        self.assertIs(data[7], narrowed.first())
+        self.assertEqual([data[1], data[4], data[7], data[10]], filtered.copy())
+        self.assertEqual([1, 4, 7, 10], list(filtered.rows()))
+        
+    def test_filter_holds_keys(self):
+        data = {'key{i}'.format(i=i): Dummy(id=i, kind='K{k}'.format(k=i % 3)) for i in range(6)}
+        filtered = EmbeddedManager(data).filter(kind='K2')
+        self.assertEqual(('key2', 'key5'), filtered.keys())
+        self.assertEqual([data['key2'], data['key5']], filtered.values())
+        self.assertEqual([('key2', data['key2']), ('key5', data['key5'])], filtered.items())
+        self.assertEqual({'key2': data['key2'], 'key5': data['key5']}, filtered.copy())
+        self.assertTrue('key5' in filtered)
+        self.assertFalse('key4' in filtered)
+        self.assertIs(data['key5'], filtered['key5'])
+        with self.assertRaises(KeyError):
+            filtered['key4']
+        self.assertEqual(('key5',), filtered.filter(id__gt=2).keys())
+    
+    def test_chained_filter_does_not_change_parent(self):
+        data = [Dummy(id=i, kind='K{k}'.format(k=i % 2)) for i in range(6)]
+        filtered = EmbeddedManager(data).filter(kind='K0')
+        chained = filtered.filter(id__gt=1)
+        self.assertEqual([0, 2, 4], [item.id for item in filtered])
+        self.assertEqual([2, 4], [item.id for item in chained])
+        
+    def test_indexed_filter_holds_rows(self):
+        data = [Dummy(id=i, kind='K{k}'.format(k=i % 3)) for i in range(9)]
+        lm = EmbeddedManager(data, indexes=['kind'])
+        filtered = lm.filter(kind='K0')
+        self.assertTrue(filtered.is_materialised())
+        self.assertEqual([0, 3, 6], list(filtered.rows()))
+        self.assertEqual([3, 6], [item.id for item in filtered.filter(id__gt=0)])
+        keyed = EmbeddedManager({str(item.id): item for item in data}, indexes=['kind'])
+        self.assertEqual(('1', '4', '7'), keyed.filter(kind='K1').keys())
+
+
+class QueryPlannerTests(TestCase):
+    
+    def data(self):
+        return [Dummy(id=i, kind='K{k}'.format(k=i % 3), rank=i % 4) for i in range(24)]
+    
+    def ids(self, iterator):
+        return [item.id for item in iterator]
+    
+    def test_chained_filters_are_independent(self):
+        lm = EmbeddedManager(self.data())
+        parent = lm.filter(kind='K1')
+        first = parent.filter(rank=1)
+        second = parent.filter(rank=3)
+        self.assertEqual([1, 13], self.ids(first))
+        self.assertEqual([7, 19], self.ids(second))
+        self.assertEqual([1, 4, 7, 10, 13, 16, 19, 22], self.ids(parent))
+        self.assertEqual([], self.ids(parent.filter(kind='K2')))
+        self.assertEqual(13, parent.get(rank=1, id__gt=5).id)
+        
+    def test_cached_result_drives_children(self):
+        lm = EmbeddedManager(self.data())
+        parent = lm.filter(kind='K1')
+        child = parent.filter(rank=1)
+        self.assertEqual({'driver': 'scan', 'index': None, 'candidates': 24, 'residual': [{'kind': 'K1'}, {'rank': 1}]}, child.explain())
+        self.assertEqual(8, len(parent))
+        self.assertEqual({'driver': 'cached', 'index': None, 'candidates': 8, 'residual': [{'rank': 1}]}, child.explain())
+        self.assertEqual([1, 13], self.ids(child))
+        self.assertEqual(2, len(child))
+        self.assertEqual('materialised', child.explain()['driver'])
+        
+    def test_most_selective_index_drives(self):
+        lm = EmbeddedManager(self.data(), indexes=['rank', 'kind'])
+        chained = lm.all().filter(id__gte=6).filter(rank=2, kind='K0')
+        plan = chained.explain()
+        self.assertEqual('index', plan['driver'])
+        self.assertEqual(('rank',), plan['index'])
+        self.assertEqual(6, plan['candidates'])
+        self.assertEqual([{'id__gte': 6}, {'kind': 'K0'}], plan['residual'])
+        self.assertEqual([6, 18], self.ids(chained))
+        self.assertEqual({'driver': 'index', 'index': ('kind',), 'candidates': 8, 'residual': [{'id__gt': 3}]}, lm.explain(kind='K2', id__gt=3))
+        
+    def test_index_narrowed_by_cached_rows(self):
+        lm = EmbeddedManager(self.data(), indexes=['rank'])
+        parent = lm.all().filter(id__lt=12)
+        self.assertEqual(12, len(parent))
+        child = parent.filter(rank=3)
+        plan = child.explain()
+        self.assertEqual(('index', ('rank',), 3, []), (plan['driver'], plan['index'], plan['candidates'], plan['residual']))
+        self.assertEqual([3, 7, 11], self.ids(child))
+        
+    def test_dict_chain(self):
+        data = {str(item.id): item for item in self.data()}
+        lm = EmbeddedManager(data, indexes=['kind'])
+        chained = lm.all().filter(rank=0).filter(kind='K0')
+        self.assertEqual('index', chained.explain()['driver'])
+        self.assertEqual(['0', '12'], list(chained))
+        self.assertTrue('12' in chained)
+        self.assertFalse('4' in lm.all().filter(rank=0).filter(kind='K0'))
+        self.assertEqual(('0', '12'), chained.keys())
+        
+    def test_replaced_data_skips_stale_indexes(self):
+        lm = EmbeddedManager(self.data(), indexes=['rank'])
+        iterator = lm.all()
+        lm.set([Dummy(id=100, rank=1, kind='K0')])
+        self.assertEqual('scan', iterator.explain(rank=1)['driver'])
+        self.assertEqual([1, 5, 9, 13, 17, 21], self.ids(iterator.filter(rank=1)))
+        
+class ResultCacheTests(TestCase):
+    
+    def data(self):
+        return [Node(id=i, kind='K{k}'.format(k=i % 3), tags=['T{t}'.format(t=i % 2)]) for i in range(12)]
+    
+    def test_version_bumped_by_mutators(self):
+        lm = EmbeddedManager(self.data())
+        self.assertEqual(0, lm.version())
+        lm.append(Node(id=12, kind='K0'))
+        lm.extend([Node(id=13, kind='K1')])
+        self.assertEqual(2, lm.version())
+        lm.set(self.data())
+        lm.clear()
+        self.assertEqual(4, lm.version())
+        dm = EmbeddedManager({}, type=Node)
+        dm.update({'a': Node(id=1)})
+        dm.create('b', id=2)
+        self.assertEqual(2, dm.version())
+        self.assertEqual(None, dm.cache_info())
+        
+    def test_filter_hits(self):
+        lm = EmbeddedManager(self.data(), cache=4)
+        self.assertEqual(4, len(lm.filter(kind='K1')))
+        with collect_stats() as collected:
+            self.assertEqual([1, 4, 7, 10], [item.id for item in lm.filter(kind='K1')])
+            self.assertEqual([4, 10], [item.id for item in lm.filter(kind='K1').filter(id__in=[4, 10])])
+        self.assertEqual(2, collected['manager.cache.hits'])
+        self.assertEqual(4, collected['items.scanned'])
+        self.assertEqual({'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 4}, lm.cache_info())
+        
+    def test_mutation_invalidates(self):
+        lm = EmbeddedManager(self.data(), cache=True)
+        self.assertEqual(4, len(lm.filter(kind='K2')))
+        self.assertEqual(5, lm.get(id=5).id)
+        lm.append(Node(id=12, kind='K2'))
+        self.assertEqual(5, len(lm.filter(kind='K2')))
+        self.assertEqual(0, lm.cache_info()['hits'])
+        lm.clear()
+        self.assertEqual(0, len(lm.filter(kind='K2')))
+        self.assertRaises(DoesNotExist, lm.get, id=5)
+        
+    def test_get_caches_misses(self):
+        lm = EmbeddedManager(self.data(), cache=True)
+        self.assertRaises(DoesNotExist, lm.get, id=99)
+        self.assertRaises(DoesNotExist, lm.get, id=99)
+        self.assertEqual(3, lm.get(id=3, kind='K0').id)
+        self.assertEqual(3, lm.get(kind='K0', id=3).id)
+        self.assertEqual({'hits': 2, 'misses': 2, 'size': 2, 'maxsize': 128}, lm.cache_info())
+        
+    def test_lru_bound_and_list_criteria(self):
+        lm = EmbeddedManager(self.data(), cache=2)
+        for kind in ['K0', 'K1', 'K0', 'K2']:
+            len(lm.filter(kind=kind))
+        self.assertEqual(2, lm.cache_info()['size'])
+        for kind in ['K0', 'K1']:
+            len(lm.filter(kind=kind))
+        self.assertEqual(2, lm.cache_info()['hits'])
+        self.assertEqual(6, len(lm.filter(tags=['T0'], kind__in=['K0', 'K1', 'K2'])))
+        self.assertEqual(6, len(lm.filter(kind__in=['K0', 'K1', 'K2'], tags=['T0'])))
+        self.assertEqual(3, lm.cache_info()['hits'])
+        
+    def test_equal_values_of_different_types(self):
+        lm = EmbeddedManager([Node(id=1, tags=[1, 2]), Node(id=2, tags=(1, 2))], cache=True)
+        self.assertEqual(1, lm.get(tags=[1, 2]).id)
+        self.assertEqual(2, lm.get(tags=(1, 2)).id)
+        self.assertEqual([1], [item.id for item in lm.filter(tags=[1, 2]).copy()])
+        self.assertEqual([2], [item.id for item in lm.filter(tags=(1, 2)).copy()])
+        self.assertEqual([1], [item.id for item in lm.filter(tags__in=[[1, 2]]).copy()])
+        self.assertEqual([2], [item.id for item in lm.filter(tags__in=[(1, 2)]).copy()])
+        self.assertEqual(0, lm.cache_info()['hits'])
+        
+    def test_streaming_is_not_materialised(self):
+        lm = EmbeddedManager(self.data(), indexes=['kind'], cache=True)
+        with collect_stats() as collected:
+            self.assertEqual(0, lm.filter(id__gte=0).first().id)
+            self.assertTrue(lm.filter(id__gte=0).exists())
+        self.assertEqual(2, collected['items.scanned'])
+        self.assertEqual(0, lm.cache_info()['size'])
+        self.assertEqual(4, len(lm.filter(kind='K1')))
+        self.assertEqual(1, lm.cache_info()['size'])
+        iterator = lm.filter(id__gte=6)
+        self.assertEqual(1, lm.cache_info()['size'])
+        self.assertEqual(6, len(iterator))
+        self.assertEqual(2, lm.cache_info()['size'])
+        self.assertEqual([6, 7], [item.id for item in lm.filter(id__gte=6)][:2])
+        self.assertEqual(1, lm.cache_info()['hits'])
+        
+    def test_dict_backed(self):
+        lm = EmbeddedManager({str(item.id): item for item in self.data()}, cache=True)
+        self.assertEqual(('0', '3', '6', '9'), lm.filter(kind='K0').keys())
+        self.assertEqual(['0', '3', '6', '9'], list(lm.filter(kind='K0')))
+        self.assertEqual(1, lm.cache_info()['hits'])
+        lm.update({'12': Node(id=12, kind='K0')})
+        self.assertEqual(['0', '3', '6', '9', '12'], list(lm.filter(kind='K0')))
+        
+class AsyncTests(TestCase):
+    
+    def setUp(self):
+        self.chunk_size = json_model.async_chunk_size
+        json_model.async_chunk_size = 10
+        
+    def tearDown(self):
+        json_model.async_chunk_size = self.chunk_size
+    
+    def data(self):
+        return [Node(id=i, kind='K{k}'.format(k=i % 3)) for i in range(100)]
+    
+    def run_with_ticks(self, coroutine):
+        ticks = []
+        async def ticker():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+        async def main():
+            task = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0)
+            try:
+                return await coroutine
+            finally:
+                task.cancel()
+        return asyncio.run(main()), len(ticks)
+    
+    def test_afilter_yields_between_chunks(self):
+        lm = EmbeddedManager(self.data())
+        iterator, ticks = self.run_with_ticks(lm.afilter(kind='K1'))
+        self.assertTrue(iterator.is_materialised())
+        self.assertEqual(list(range(1, 100, 3)), [item.id for item in iterator])
+        self.assertTrue(ticks >= 10)
+        
+    def test_afilter_matches_filter(self):
+        lm = EmbeddedManager(self.data(), indexes=['kind'], cache=True)
+        iterator, ticks = self.run_with_ticks(lm.afilter(kind='K2', id__gt=50))
+        self.assertEqual([item.id for item in lm.filter(kind='K2', id__gt=50)], [item.id for item in iterator])
+        self.assertEqual(1, lm.cache_info()['hits'])
+        dm = EmbeddedManager({str(item.id): item for item in self.data()})
+        iterator, ticks = self.run_with_ticks(dm.afilter(id__lt=7))
+        self.assertEqual(('0', '1', '2', '3', '4', '5', '6'), iterator.keys())
+        
+    def test_aiter(self):
+        lm = EmbeddedManager(self.data())
+        async def collect(iterator):
+            return [item.id async for item in iterator]
+        ids, ticks = self.run_with_ticks(collect(lm.filter(kind='K0').filter(id__lt=30)))
+        self.assertEqual(list(range(0, 30, 3)), ids)
+        self.assertTrue(ticks >= 10)
+        ids, ticks = self.run_with_ticks(collect(lm.all()))
+        self.assertEqual(list(range(100)), ids)
+        
+    def test_afind(self):
+        root = Node(id=0, children=EmbeddedManager(self.data()))
+        found, ticks = self.run_with_ticks(root.__afind__('children[kind="K1"].id'))
+        self.assertEqual(root.__find__('children[kind="K1"].id'), found)
+        found, ticks = self.run_with_ticks(root.__afind__('**.id', max_depth=1))
+        self.assertEqual(list(range(100)), found)
+        
+class StreamingFindTests(TestCase):
+    
+    def tree(self):
+        leaf = Node(id=-1, name='LINKED')
+        return Node(id=0, name='ROOT', children=EmbeddedManager([
+            Node(id=i, kind='K{k}'.format(k=i % 3), children=[Node(id=10 * i + j, name='LEAF', link=leaf) for j in range(3)])
+            for i in range(1, 7)
+        ]), lookup={'a': Node(id=100, kind='K1'), 'b': Node(id=101, kind='K2')})
+    
+    def test_matches_find(self):
+        root = self.tree()
+        for path in ['children', 'children.id', 'children[kind="K1"].children.id', 'children[1].id',
+                     'lookup[kind="K2"].id', '*.id', '**.id', '**[kind="K1"].id', '**.link.name', 'missing.id', '']:
+            self.assertEqual(root.__find__(path), list(root.__iter_find__(path)), path)
+        self.assertEqual(root.__find__('**.id', max_depth=2), list(root.__iter_find__('**.id', max_depth=2)))
         
+    def test_lazy(self):
+        root = self.tree()
+        found = root.__iter_find__('children[kind="K1"].children.id')
+        with collect_stats() as collected:
+            self.assertEqual(10, next(found))
+        self.assertEqual(1, collected['items.scanned'])
+        self.assertEqual([11, 12, 40, 41, 42], list(found))
         
-        
\ No newline at end of file
+    def test_find_first(self):
+        root = self.tree()
+        with collect_stats() as collected:
+            self.assertEqual(20, root.__find_first__('children[kind="K2"].children.id'))
+        self.assertEqual(2, collected['items.scanned'])
+        self.assertEqual(root.__find__('**.id')[0], root.__find_first__('**.id'))
+        self.assertEqual('LINKED', root.__find_first__('**.link.name'))
+        self.assertEqual(None, root.__find_first__('children[kind="K9"].id'))
+        self.assertEqual(None, root.__find_first__(''))
@@ -0,0 +1,170 @@
+from unittest import TestCase
+from io import BytesIO, StringIO
+import json
+from json_model import EmbeddedManager, DoesNotExist, F, load, loads, iter_load, dump, dumps, encoders, register_encoder
+
+class Item(object):
+    
+    built = 0
+    
+    def __init__(self, **kw):
+        Item.built = Item.built + 1
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+class LoadTests(TestCase):
+    
+    def document(self):
+        return json.dumps({
+            'meta': {'note': 'a string with ] and } in it', 'tags': [1, [2, 3], {'x': None}]},
+            'data': {'items': [{'id': i, 'name': 'NAME_{i}'.format(i=i % 3), 'text': 'é' * i} for i in range(20)]}
+        })
+    
+    def test_iter_load_top_level_list(self):
+        self.assertEqual([1, 22, 'x', {'a': [3]}], list(iter_load(StringIO(' [ 1 , 22, "x", {"a": [3]} ] '), chunk_size=1)))
+        self.assertEqual([], list(iter_load(StringIO('[ ]'))))
+    
+    def test_load_with_path_across_chunk_sizes(self):
+        text = self.document()
+        for chunk_size in [1, 2, 7, 64, 65536]:
+            lm = load(BytesIO(text.encode('utf-8')), type=Item, path='data.items', chunk_size=chunk_size)
+            self.assertIsInstance(lm, EmbeddedManager)
+            self.assertEqual(list(range(20)), [item.id for item in lm.all()])
+            self.assertEqual('é' * 19, lm.get(id=19).text)
+    
+    def test_numbers_split_across_chunks(self):
+        values = [35000000000.0, 1, 1.25, 1e5, -2.5e-3, 12345.678e-9, 0.1, -7, True, None, 'a"b\\', {'k': [1.5, 2e10]}]
+        text = json.dumps(values)
+        for chunk_size in range(1, 24):
+            self.assertEqual(values, list(iter_load(StringIO(text), chunk_size=chunk_size)), chunk_size)
+            self.assertEqual(values, list(iter_load(BytesIO(text.encode('utf-8')), chunk_size=chunk_size)), chunk_size)
+        floats = [i * 1.0137 + 1e-7 for i in range(3000)]
+        for chunk_size in [3, 5, 11, 64, 1000]:
+            self.assertEqual(floats, list(iter_load(StringIO(json.dumps(floats)), chunk_size=chunk_size)))
+            
+    def test_skipped_siblings_across_chunk_sizes(self):
+        text = json.dumps({
+            'skip': [{'s': 'x]}"\\' * i, 'n': [i, {'d': 1.5e3}], 'u': '\u00e9'} for i in range(30)],
+            'also': 'tail " } ]',
+            'data': {'first': -1.5, 'items': [1.5, 2]}
+        })
+        for chunk_size in [1, 2, 3, 5, 16, 65536]:
+            self.assertEqual([1.5, 2], list(iter_load(StringIO(text), path='data.items', chunk_size=chunk_size)))
+        with self.assertRaises(ValueError):
+            list(iter_load(StringIO('{"skip": [1, {"a": "b"}, "data": [1]}'), path='data', chunk_size=4))
+            
+    def test_filter_rejects_before_build(self):
+        Item.built = 0
+        lm = loads(self.document(), type=Item, path=['data', 'items'], filter={'name': 'NAME_1', 'id__gt': 5})
+        self.assertEqual([7, 10, 13, 16, 19], [item.id for item in lm.all()])
+        self.assertEqual(5, Item.built)
+        
+    def test_filter_without_type(self):
+        lm = loads('[{"a": 1, "b": 1}, {"a": 1, "b": 2}, {"a": 3, "b": 4}]', filter={'a': F('b')})
+        self.assertEqual([{'a': 1, 'b': 1}], list(lm.all()))
+        
+    def test_manager_options_are_forwarded(self):
+        lm = loads(self.document(), type=Item, path='data.items', indexes=['name'])
+        self.assertEqual([('name',)], lm.indexes())
+        
+    def test_errors(self):
+        with self.assertRaises(DoesNotExist):
+            loads(self.document(), path='data.missing')
+        with self.assertRaises(ValueError):
+            loads('{"data": [1, 2')
+        with self.assertRaises(ValueError):
+            loads('[1, 2', chunk_size=1)
+
+
+class Model(object):
+    
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+    
+    def describe(self):
+        return 'MODEL'
+    
+
+class Hidden(Model):
+    
+    __traversable__ = ('id',)
+
+
+class Slotted(object):
+    
+    __slots__ = ('id', 'name')
+    
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+class DumpTests(TestCase):
+    
+    def model(self):
+        children = EmbeddedManager([Model(id=i, name='CHILD_{i}'.format(i=i)) for i in range(3)], type=Model)
+        keyed = EmbeddedManager({'a': Model(id=10, tags=('x', 'y')), 'b': Hidden(id=11, secret='S')}, type=Model)
+        return Model(id=1, name='ROOT', children=children, keyed=keyed, selected=children.filter(id__gte=1), _private=True)
+    
+    def expected(self):
+        return {
+            'id': 1, 'name': 'ROOT',
+            'children': [{'id': i, 'name': 'CHILD_{i}'.format(i=i)} for i in range(3)],
+            'keyed': {'a': {'id': 10, 'tags': ['x', 'y']}, 'b': {'id': 11}},
+            'selected': [{'id': 1, 'name': 'CHILD_1'}, {'id': 2, 'name': 'CHILD_2'}]
+        }
+    
+    def test_dumps_with_each_encoder(self):
+        for name in encoders:
+            self.assertEqual(self.expected(), json.loads(dumps(self.model(), encoder=name)))
+        self.assertEqual(self.expected(), json.loads(dumps(self.model(), indent=2)))
+            
+    def test_dump_in_chunks(self):
+        writes = []
+        class Sink(StringIO):
+            def write(self, chunk):
+                writes.append(chunk)
+                return StringIO.write(self, chunk)
+        for name in encoders:
+            del writes[:]
+            sink = Sink()
+            dump(self.model(), sink, encoder=name, chunk_size=16)
+            self.assertEqual(self.expected(), json.loads(sink.getvalue()))
+            self.assertTrue(len(writes) > 1)
+            buffer = BytesIO()
+            dump(self.model(), buffer, encoder=name)
+            self.assertEqual(self.expected(), json.loads(buffer.getvalue().decode('utf-8')))
+    
+    def test_round_trip(self):
+        text = dumps({'items': EmbeddedManager([Model(id=i, name='N') for i in range(5)])})
+        self.assertEqual([3, 4], [item.id for item in loads(text, type=Model, path='items', filter={'id__gt': 2}).all()])
+            
+    def test_pluggable_encoder(self):
+        class Upper(object):
+            def dumps(self, obj, default, **kw):
+                return json.dumps(obj, default=default).upper()
+        register_encoder('upper', Upper())
+        try:
+            self.assertEqual('[{"ID": 1}]', dumps(EmbeddedManager([Hidden(id=1)]), encoder='upper'))
+        finally:
+            del encoders['upper']
+        with self.assertRaises(ValueError):
+            dumps([], encoder='missing')
+            
+    def test_default_encoder_is_stdlib(self):
+        self.assertEqual('[1, {"a": 2}]', dumps([1, {'a': 2}]))
+        self.assertEqual('{"id": 1180591620717411303424}', dumps(Model(id=2 ** 70)))
+        buffer = StringIO()
+        dump([1, {'a': 2}], buffer)
+        self.assertEqual('[1, {"a": 2}]', buffer.getvalue())
+        
+    def test_unset_attributes_are_skipped(self):
+        for name in encoders:
+            self.assertEqual([{'id': 1}, {'id': 2, 'name': 'N'}], json.loads(dumps([Slotted(id=1), Slotted(id=2, name='N')], encoder=name)))
+            self.assertEqual([{}], json.loads(dumps([Hidden(name='N')], encoder=name)))
+        
+    def test_unserialisable(self):
+        with self.assertRaises(TypeError):
+            dumps(object(), encoder='json')
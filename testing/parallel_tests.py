@@ -0,0 +1,60 @@
+from unittest import TestCase
+import pickle
+from json_model import EmbeddedManager, F, Expression, FinderExpression, ParallelExecutor
+from .embedded_manager_tests import Node
+
+class ParallelExecutorTests(TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.executors = [
+            ParallelExecutor(workers=3, threshold=10, kind='thread'),
+            ParallelExecutor(workers=2, threshold=10, kind='process', chunks=3)
+        ]
+        
+    @classmethod
+    def tearDownClass(cls):
+        for executor in cls.executors:
+            executor.shutdown()
+    
+    def tree(self):
+        return Node(id=0, children=EmbeddedManager([
+            Node(id=i, name='NAME_{i}'.format(i=i), children=[Node(id=i * 100 + j, name='CHILD') for j in range(2)])
+            for i in range(1, 31)
+        ]))
+    
+    def test_expressions_pickle_by_path(self):
+        for expression in [Expression.compile('a[name="x"].b'), FinderExpression.compile('**.name', max_depth=3), F('a.b')]:
+            copy = pickle.loads(pickle.dumps(expression))
+            self.assertEqual(type(expression), type(copy))
+            self.assertEqual(expression.path, copy.path)
+            self.assertEqual(expression.options, copy.options)
+        self.assertIs(Expression.compile('a[name="x"].b'), pickle.loads(pickle.dumps(Expression.compile('a[name="x"].b'))))
+        
+    def test_invalid_kind(self):
+        with self.assertRaises(ValueError):
+            ParallelExecutor(kind='fibre')
+    
+    def test_filter_preserves_order_and_identity(self):
+        data = [Node(id=i, kind=i % 3, rank=i % 5) for i in range(100)]
+        serial = EmbeddedManager(data)
+        for executor in self.executors:
+            lm = EmbeddedManager(data, executor=executor)
+            for criteria in [{'kind': 1}, {'kind__in': [0, 2], 'rank__gt': 2}, {'kind': F('rank')}]:
+                expected = [item.id for item in serial.filter(**criteria)]
+                actual = lm.filter(**criteria)
+                self.assertEqual(expected, [item.id for item in actual])
+                for item in actual:
+                    self.assertIs(data[item.id], item)
+        
+    def test_below_threshold_stays_serial(self):
+        executor = ParallelExecutor(workers=4, threshold=1000, kind='thread')
+        lm = EmbeddedManager([Node(id=i) for i in range(10)], executor=executor)
+        self.assertEqual([3], [item.id for item in lm.filter(id=3)])
+        self.assertFalse(executor.parallel(lm.data()))
+        self.assertEqual(None, executor._ParallelExecutor__pool)
+        
+    def test_find_is_serial(self):
+        tree = self.tree()
+        with self.assertRaises(TypeError):
+            tree.__find__('**.name', executor=self.executors[0])
@@ -0,0 +1,123 @@
+from unittest import TestCase
+import os
+import tempfile
+import threading
+from json_model import EmbeddedManager, MappedList, DoesNotExist, dumps, loads
+
+class Record(object):
+    
+    def __init__(self, **kw):
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+
+class MappedListTests(TestCase):
+    
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jmml')
+        os.close(handle)
+        
+    def tearDown(self):
+        os.remove(self.path)
+        
+    def test_append_and_read_back(self):
+        with MappedList(self.path) as data:
+            self.assertEqual(0, len(data))
+            data.append({'id': 1, 'name': 'NAME_1'})
+            data.extend({'id': i, 'name': 'NAME_{i}'.format(i=i)} for i in range(2, 5))
+            self.assertEqual(4, len(data))
+            self.assertEqual({'id': 3, 'name': 'NAME_3'}, data[2])
+            self.assertEqual(4, data[-1]['id'])
+            self.assertEqual([2, 3], [item['id'] for item in data[1:3]])
+            self.assertEqual([1, 2, 3, 4], [item['id'] for item in data])
+            with self.assertRaises(IndexError):
+                data[4]
+        with MappedList(self.path, type=Record) as data:
+            self.assertEqual(4, len(data))
+            self.assertEqual('NAME_2', data[1].name)
+            
+    def test_offsets_are_built_lazily(self):
+        with MappedList(self.path) as data:
+            data.extend({'id': i} for i in range(10))
+        with MappedList(self.path) as data:
+            offsets = data._MappedList__offsets
+            self.assertEqual(10, len(data))
+            self.assertEqual(0, len(offsets))
+            self.assertEqual(2, data[2]['id'])
+            self.assertEqual(3, len(offsets))
+            self.assertEqual([9, 6], [item['id'] for item in data[9:5:-3]])
+            self.assertEqual(10, len(offsets))
+            self.assertEqual('Q', offsets.typecode)
+            
+    def test_shared_between_instances(self):
+        with MappedList(self.path) as writer, MappedList(self.path) as reader:
+            writer.append({'id': 1})
+            self.assertEqual(1, len(reader))
+            self.assertEqual({'id': 1}, reader[0])
+            writer.extend([{'id': 2}, {'id': 3}])
+            self.assertEqual([1, 2, 3], [item['id'] for item in reader])
+            
+    def test_concurrent_writers(self):
+        def write(writer):
+            with MappedList(self.path) as data:
+                for i in range(50):
+                    data.append({'writer': writer, 'id': i})
+        threads = [threading.Thread(target=write, args=(writer,)) for writer in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with MappedList(self.path) as data:
+            self.assertEqual(200, len(data))
+            self.assertEqual(
+                sorted((writer, i) for writer in range(4) for i in range(50)),
+                sorted((item['writer'], item['id']) for item in data))
+            
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as fp:
+            fp.write(b'NOT A MAPPED LIST')
+        with self.assertRaises(ValueError):
+            MappedList(self.path)
+    
+    def test_embedded_manager(self):
+        with MappedList(self.path, type=Record) as data:
+            lm = EmbeddedManager(data, type=Record, indexes=['name'])
+            self.assertTrue(lm.is_list())
+            lm.create(id=1, name='NAME_A', owner='O1')
+            lm.append(Record(id=2, name='NAME_B', owner='O1'))
+            lm.extend([Record(id=3, name='NAME_A', owner='O2')])
+            self.assertEqual(3, len(data))
+            self.assertEqual([1, 3], [item.id for item in lm.filter(name='NAME_A')])
+            self.assertEqual(2, lm.get(owner='O1', name='NAME_B').id)
+            self.assertEqual([3], [item.id for item in lm.all().filter(owner='O2')])
+            with self.assertRaises(DoesNotExist):
+                lm.get(name='NAME_C')
+            self.assertEqual([1, 2, 3], [item.id for item in lm.all()])
+            
+    def test_indexes_and_views_catch_up_with_other_writers(self):
+        with MappedList(self.path, type=Record) as data, MappedList(self.path, type=Record) as other:
+            data.extend([Record(id=i, k=i % 3) for i in range(3)])
+            lm = EmbeddedManager(data, type=Record, indexes=['k'], sorted_indexes=['id'], cache=True)
+            view = lm.view(k=1)
+            self.assertEqual([1], [item.id for item in lm.filter(k=1)])
+            version = lm.version()
+            other.append(Record(id=3, k=4))
+            other.extend([Record(id=4, k=1), Record(id=5, k=4)])
+            self.assertEqual(6, len(lm))
+            self.assertEqual([3, 5], [item.id for item in lm.filter(k=4)])
+            self.assertEqual(version + 1, lm.version())
+            self.assertEqual([1, 4], [item.id for item in lm.filter(k=1)])
+            self.assertEqual([4, 5], [item.id for item in lm.filter(id__gte=4)])
+            self.assertEqual(('index', ('k',)), (lm.explain(k=4)['driver'], lm.explain(k=4)['index']))
+            other.append(Record(id=6, k=1))
+            self.assertEqual([1, 4, 6], [item.id for item in view])
+            other.append(Record(id=7, k=1))
+            lm.append(Record(id=8, k=1))
+            self.assertEqual([1, 4, 6, 7, 8], [item.id for item in lm.filter(k=1)])
+            self.assertEqual(5, len(view))
+            
+    def test_dumps(self):
+        with MappedList(self.path) as data:
+            data.extend([{'id': 1}, {'id': 2}])
+            for lm in [data, EmbeddedManager(data)]:
+                self.assertEqual([1, 2], [item['id'] for item in loads(dumps(lm)).all()])